@@ -1,9 +1,7 @@
 #!/usr/bin/env python3
 
-from PyQt5 import QtGui  # Added to be able to import ovito
-
-from ovito.modifiers import VoronoiAnalysisModifier
-from ovito.io import import_file
+import pipeline
+import archive
 
 
 def log_frames(name):
@@ -18,7 +16,7 @@ def log_frames(name):
 
     steps = []
     condition = False
-    with open(name) as f:
+    with archive.open(name) as f:
         for line in f:
             line = line.strip().split(' ')
 
@@ -37,30 +35,19 @@ def log_frames(name):
     return frames
 
 
-def vp(name, frame, edge_threshold=0.1):
+def vp(name, edge_threshold=0.1, backend='ovito'):
     '''
-    Grap the Voronoi Polyhedra (VP) indexes.
+    Grap the Voronoi Polyhedra (VP) indexes of the final minimized frame.
+    Both backends read the same last complete frame of the file.
 
     inputs:
         name = The name with the path of the trajectories
         edge_threshold = The threshold for the edges considered
-        frame = The frame of the trajectories
+        backend = Compute with OVITO (ovito) or SciPy (native)
     outputs:
         indexes = The VP indexes
     '''
 
-    # Load input data and create an ObjectNode with a data pipeline.
-    node = import_file(name, multiple_frames=True)
-
-    voro = VoronoiAnalysisModifier(
-                                   compute_indices=True,
-                                   use_radii=False,
-                                   edge_threshold=edge_threshold
-                                   )
-
-    node.modifiers.append(voro)
-
-    out = node.compute(frame)
-    indexes = out.particle_properties['Voronoi Index'].array
+    indexes = pipeline.last_indexes(name, edge_threshold, backend)
 
     return indexes
@@ -3,12 +3,14 @@
 from matplotlib import pyplot as pl
 
 from calculations_2450k_minimization import *
+from vp import histogram, cumulative_variance
 
 from os.path import join
 
 import pandas as pd
 import numpy as np
 
+import manifest
 import sys
 import os
 
@@ -23,6 +25,9 @@ dominantvp = int(sys.argv[6])  # The top number of VP types
 
 export = sys.argv[7]  # Location of export files
 
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[8] if len(sys.argv) > 8 else 'ovito'
+
 # Count the number of runs
 total = 0
 for path, subdir, files in os.walk(datadir):
@@ -70,25 +75,31 @@ for path, subdirs, files in os.walk(datadir):
     job = run[-3]
     framestep = run[-1]
 
-    all_indexes = []
+    # Export directory for data
+    calcdir = join(*[export, path, 'data', 'variance'])
+
+    # Skip runs computed from the same files with the same parameters
+    inputs = []
     for sub in subdirs:
+        inputs.append(join(*[path, sub, trajname]))
+        inputs.append(join(*[path, sub, logname]))
 
-        trajfile = join(*[path, sub, trajname])
-        logfile = join(*[path, sub, logname])
+    parameters = {'edge_threshold': edge_threshold, 'backend': backend}
+    if manifest.current(calcdir, 'variance', inputs, parameters):
+        print('Up to date ('+str(count)+'/'+str(total)+'): '+join(*run))
+        count += 1
+        continue
 
-        frames = log_frames(logfile)  # Get the numer of minimization frames
-        indexes = vp(trajfile, frames, edge_threshold)  # VP indexes
+    # Count the number of unique VP one run at a time
+    vps = histogram()
+    for sub in subdirs:
 
-        all_indexes.append(indexes)
+        trajfile = join(*[path, sub, trajname])
+        indexes = vp(trajfile, edge_threshold, backend)  # Final VP indexes
 
-    # Combine all the frames
-    all_indexes = [pd.DataFrame(i) for i in all_indexes]
-    df = pd.concat(all_indexes)
-    df = df.fillna(0)  # Make cure indexes are zero if not included
-    df = df.astype(int)  # Make sure all counts are integers
+        vps.add(indexes)
 
-    # Count the number of unique VP
-    coords, counts = np.unique(df.values, axis=0, return_counts=True)
+    coords, counts = vps.unique()
 
     # Standard notation
     coords = coords[:, 2:]
@@ -105,23 +116,16 @@ for path, subdirs, files in os.walk(datadir):
     fractions = counts/total_vp
 
     # Calculate variance from list including ordered fractions of VP
-    variance = []
-    for i in range(1, counts.shape[0]):
-        variance.append(np.var(fractions[:i]))
-
-    variance = np.array(variance)  # Numpy array
+    variance, max_index = cumulative_variance(fractions)
     vptypes = np.arange(1, len(variance)+1)  # Types of vp
 
     df_variance = {'number_of_vp': vptypes, 'variance': variance}
     df_variance = pd.DataFrame(df_variance)
     df_variance['number_of_vp'] = df_variance['number_of_vp'].astype(int)
 
-    max_index = np.argmax(variance)
     max_variance = pd.DataFrame(df_variance.loc[max_index, :]).T
     max_variance['number_of_vp'] = max_variance['number_of_vp'].astype(int)
 
-    # Export directory for data
-    calcdir = join(*[export, path, 'data', 'variance'])
     if not os.path.exists(calcdir):
         os.makedirs(calcdir)
 
@@ -136,6 +140,9 @@ for path, subdirs, files in os.walk(datadir):
                         index=False
                         )
 
+    outputs = [join(calcdir, i) for i in ['variance.txt', 'max_variance.txt']]
+    manifest.write(calcdir, 'variance', inputs, parameters, outputs)
+
     # Export directory for plots
     plotdir = join(*[export, path, 'plots', 'variance'])
     if not os.path.exists(plotdir):
@@ -0,0 +1,292 @@
+'''
+Reuse OVITO pipelines between calls instead of importing a file each time.
+Voronoi indexes can also be computed without OVITO by the native backend.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import tempfile
+import archive
+import traj
+import vp
+import os
+
+# Pipelines built by this process with the file currently loaded
+pipelines = {}
+
+
+def topology(name):
+    '''
+    Read the number of atoms and the atom columns of the first frame.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        natoms = The number of atoms
+        columns = The names of the atom columns
+    '''
+
+    with archive.open(name) as file:
+        header = [next(file) for i in range(9)]
+
+    natoms = int(header[3])
+    columns = tuple(header[8].split()[2:])
+
+    return natoms, columns
+
+
+def voronoi(name, threshold=0.1):
+    '''
+    Get a pipeline that computes Voronoi indexes for a trajectory file.
+    Pipelines are kept per modifier setting and topology. A kept pipeline
+    only has its source swapped when it is asked for a different file.
+
+    inputs:
+        name = The location of the trajectory file
+        threshold = The maximum length for a VP edge
+
+    outputs:
+        node = The pipeline
+    '''
+
+    # Only needed by the OVITO backend
+    from PyQt5 import QtGui  # Added to be able to import ovito
+
+    from ovito.modifiers import VoronoiAnalysisModifier
+    from ovito.io import import_file
+
+    # OVITO only reads plain files
+    if archive.split(name)[0] is not None:
+        message = 'Use the native backend for archive members: '+name
+        raise ValueError(message)
+
+    key = ('voronoi', threshold, topology(name))
+
+    if key in pipelines:
+        node, loaded = pipelines[key]
+
+        if loaded != name:
+            node.source.load(name, multiple_frames=True)
+
+    else:
+
+        # Load input data and create an ObjectNode with a data pipeline.
+        node = import_file(name, multiple_frames=True)
+
+        voro = VoronoiAnalysisModifier(
+                                       compute_indices=True,
+                                       use_radii=False,
+                                       edge_threshold=threshold
+                                       )
+
+        node.modifiers.append(voro)
+
+    pipelines[key] = (node, name)
+
+    return node
+
+
+def native_indexes(name, frames, threshold=0.1):
+    '''
+    Compute the Voronoi indexes of frames with SciPy. Atoms are sorted by id.
+    Frames past the end of the file give the last frame as they do in OVITO.
+
+    inputs:
+        name = The location of the trajectory file
+        frames = The frames to compute
+        threshold = The maximum length for a VP edge
+
+    outputs:
+        indexes = The Voronoi indexes of each frame as int16 arrays
+    '''
+
+    df, columns = traj.index(name)
+    bounds = df[['xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']].values
+
+    indexes = []
+    for frame in frames:
+        frame = min(max(frame, 0), df.shape[0]-1)
+
+        atoms = traj.read_frames(name, frame)
+        positions = traj.coordinates(atoms)[0]
+
+        index = vp.indexes(positions, bounds[frame], threshold)
+        indexes.append(index.astype(np.int16))
+
+    return indexes
+
+
+def voronoi_indexes(name, frames, threshold=0.1, backend='ovito'):
+    '''
+    Compute the Voronoi indexes of frames with one pipeline.
+
+    inputs:
+        name = The location of the trajectory file
+        frames = The frames to compute
+        threshold = The maximum length for a VP edge
+        backend = Compute with OVITO (ovito) or SciPy (native)
+
+    outputs:
+        indexes = The Voronoi indexes of each frame as int16 arrays
+    '''
+
+    if backend == 'native':
+        return native_indexes(name, frames, threshold)
+
+    elif backend != 'ovito':
+        message = 'Unknown Voronoi backend: '+str(backend)
+        raise ValueError(message)
+
+    node = voronoi(name, threshold)
+
+    indexes = []
+    for frame in frames:
+        out = node.compute(frame)
+        index = out.particle_properties['Voronoi Index'].array
+        indexes.append(np.array(index, dtype=np.int16))
+
+    return indexes
+
+
+def last_indexes(name, threshold=0.1, backend='ovito'):
+    '''
+    Compute the Voronoi indexes of the last frame without reading the rest
+    of the trajectory file. OVITO gets a temporary file holding only the
+    last frame so that it does not scan every frame.
+
+    inputs:
+        name = The location of the trajectory file
+        threshold = The maximum length for a VP edge
+        backend = Compute with OVITO (ovito) or SciPy (native)
+
+    outputs:
+        indexes = The Voronoi indexes of the last frame as an int16 array
+    '''
+
+    if backend == 'native':
+        df, atoms = traj.last(name)
+        bounds = df[['xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']].values[0]
+        positions = traj.coordinates(atoms)[0]
+
+        indexes = vp.indexes(positions, bounds, threshold)
+
+        return indexes.astype(np.int16)
+
+    frame, columns = traj.tail(name)
+
+    handle, temporary = tempfile.mkstemp(suffix='.lammpstrj')
+    try:
+        with archive.open(name, 'rb') as file:
+            with os.fdopen(handle, 'wb') as outfile:
+                file.seek(frame[-3])
+                outfile.write(file.read(frame[-1]-frame[-3]))
+
+        indexes = voronoi_indexes(temporary, [0], threshold, backend)[0]
+
+    finally:
+        os.remove(temporary)
+
+    return indexes
+
+
+def voronoi_frames(
+                   name,
+                   frames,
+                   threshold=0.1,
+                   workers=1,
+                   shards=4,
+                   backend='ovito'
+                   ):
+    '''
+    Compute the Voronoi indexes of frames spread over a pool of processes.
+    Frames are split into contiguous shards and the indexes are given back
+    in frame order as soon as each shard is done.
+
+    inputs:
+        name = The location of the trajectory file
+        frames = The frames to compute
+        threshold = The maximum length for a VP edge
+        workers = The number of processes
+        shards = The number of shards given to each process
+        backend = Compute with OVITO (ovito) or SciPy (native)
+
+    outputs:
+        index = The Voronoi indexes of one frame at a time
+    '''
+
+    frames = list(frames)
+
+    if (workers < 2) or (len(frames) < 2):
+        for frame in frames:
+            yield voronoi_indexes(name, [frame], threshold, backend)[0]
+
+        return
+
+    # Build the frame index once before the processes read it
+    if backend == 'native':
+        traj.index(name)
+
+    splits = np.array_split(frames, min(workers*shards, len(frames)))
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+                   pool.submit(
+                               voronoi_indexes,
+                               name,
+                               list(i),
+                               threshold,
+                               backend
+                               )
+                   for i in splits
+                   ]
+
+        for future in futures:
+            for index in future.result():
+                yield index
+
+
+def crosscheck(name, frame, threshold=0.1):
+    '''
+    Compare the Voronoi indexes of a frame from OVITO and SciPy. Both must
+    read the same timestep.
+
+    inputs:
+        name = The location of the trajectory file
+        frame = The frame to compare
+        threshold = The maximum length for a VP edge
+
+    outputs:
+        fraction = The fraction of atoms with the same Voronoi index
+    '''
+
+    node = voronoi(name, threshold)
+    out = node.compute(frame)
+
+    # The frame SciPy reads after clamping to the file
+    df, columns = traj.index(name)
+    step = df['Step'].values[min(max(frame, 0), df.shape[0]-1)]
+
+    if out.attributes['Timestep'] != step:
+        message = (
+                   'OVITO read step '+str(out.attributes['Timestep']) +
+                   ' but SciPy read step '+str(step)+' of '+name
+                   )
+        raise ValueError(message)
+
+    ovito = np.array(out.particle_properties['Voronoi Index'].array)
+    ids = np.array(out.particle_properties['Particle Identifier'].array)
+    ovito = ovito[np.argsort(ids)]
+
+    native = native_indexes(name, [frame], threshold)[0]
+
+    # Pad the narrower indexes with zeros
+    width = max(ovito.shape[1], native.shape[1])
+    ovito = np.pad(ovito, ((0, 0), (0, width-ovito.shape[1])), 'constant')
+    native = np.pad(native, ((0, 0), (0, width-native.shape[1])), 'constant')
+
+    fraction = np.mean(np.all(ovito == native, axis=1))
+
+    return fraction
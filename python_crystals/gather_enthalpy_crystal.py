@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
+import lastrow
 import sys
 import os
 
@@ -9,61 +12,64 @@ jobs_dir = sys.argv[1]  # The job directories
 export_dir = sys.argv[2]  # The export directory
 crystal_ref_run = sys.argv[3]  # The name of the input file
 logdotlammps = sys.argv[4]  # The name of the log file
+workers = int(sys.argv[5]) if len(sys.argv) > 5 else 1  # Processes
 
-# Make export directory
-if not os.path.exists(export_dir):
-    os.makedirs(export_dir)
 
-# Loop for each path
-df = []
-for item in os.walk(jobs_dir):
+def gather(path):
+    '''
+    Gather the final enthalpy of a run from the last thermo row of its log.
 
-    path = item[0]
-    files = item[2]
+    inputs:
+        path = The path of the run
 
-    if not ((crystal_ref_run in files) and (logdotlammps in files)):
-        continue
+    outputs:
+        row = The phase, system, composition, and enthalpy
+    '''
 
-    if crystal_ref_run in files:
-        with open(os.path.join(path, crystal_ref_run)) as f:
-            for line in f:
-                line = line.strip().split(' ')
-                if 'thermo_style' == line[0]:
-                    line = [i for i in line if i != '']
-                    columns = line[2:]
+    enthalpy = lastrow.value(
+                             os.path.join(path, logdotlammps),
+                             os.path.join(path, crystal_ref_run),
+                             'enthalpy'
+                             )
 
-    data = []
-    if logdotlammps in files:
+    split = path.split('/')
 
-        with open(os.path.join(path, logdotlammps)) as f:
-            for line in f:
-                line = line.strip().split(' ')
-                line = [i for i in line if '' != i]
+    phase = split[-3]
+    system = split[-2]
+    composition = split[-1]
 
-                if len(line) != len(columns):
-                    continue
+    row = [phase, system, composition, enthalpy]
 
-                try:
-                    row = [float(i) for i in line]
-                    data.append(row)
+    return row
 
-                except Exception:
-                    pass
 
-    split = path.split('/')
+if __name__ == '__main__':
+    # Make export directory
+    if not os.path.exists(export_dir):
+        os.makedirs(export_dir)
 
-    phase = split[-3]
-    system = split[-2]
-    composition = split[-1]
+    # Gather the runs with both files
+    paths = []
+    for item in os.walk(jobs_dir):
 
-    dfdata = pd.DataFrame(data, columns=columns)
-    enthalpy = dfdata['enthalpy'].values[-1]
+        path = item[0]
+        files = item[2]
 
-    row = [phase, system, composition, enthalpy]
-    df.append(row)
+        if not ((crystal_ref_run in files) and (logdotlammps in files)):
+            continue
+
+        paths.append(path)
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            df = list(pool.map(gather, paths, chunksize=16))
+
+    else:
+        df = [gather(path) for path in paths]
 
-df = pd.DataFrame(df)
-df.columns = ['phase', 'system', 'composition', 'enthalpy']
+    df = pd.DataFrame(df)
+    df.columns = ['phase', 'system', 'composition', 'enthalpy']
 
-df.to_csv(os.path.join(export_dir, 'enthalpy_crystal_df.txt'), index=False)
-df.to_html(os.path.join(export_dir, 'enthalpy_crystal_df.html'), index=False)
+    name = os.path.join(export_dir, 'enthalpy_crystal_df')
+    df.to_csv(name+'.txt', index=False)
+    df.to_html(name+'.html', index=False)
@@ -0,0 +1,133 @@
+'''
+Read the last thermo row of a LAMMPS log file without parsing the whole file.
+The file is read backwards from the end in chunks until a complete row with
+the expected number of columns is found.
+'''
+
+import numpy as np
+
+import os
+
+
+def columns(name):
+    '''
+    Gather the thermo column names from the last thermo_style command of an
+    input file.
+
+    inputs:
+        name = The location of the LAMMPS input file
+
+    outputs:
+        headers = The names of the thermo columns
+    '''
+
+    headers = None
+    with open(name) as f:
+        for line in f:
+            values = line.split()
+            if values and (values[0] == 'thermo_style'):
+                headers = values[2:]
+
+    if headers is None:
+        message = 'No thermo_style command in '+name
+        raise ValueError(message)
+
+    return headers
+
+
+def row(line, ncolumns):
+    '''
+    Convert a line of a log file into a thermo row.
+
+    inputs:
+        line = The line of the log file
+        ncolumns = The number of thermo columns
+
+    outputs:
+        values = The numbers of the row (None if the line is not a row)
+    '''
+
+    values = line.split()
+
+    if len(values) != ncolumns:
+        return None
+
+    try:
+        values = np.array(values, dtype=float)
+
+    except ValueError:
+        return None
+
+    return values
+
+
+def last(name, ncolumns, chunk=2**16):
+    '''
+    Find the last complete thermo row of a log file. A trailing line without
+    a newline is skipped because the run may have stopped while writing it.
+
+    inputs:
+        name = The location of the LAMMPS log file
+        ncolumns = The number of thermo columns
+        chunk = The number of bytes read at a time
+
+    outputs:
+        values = The numbers of the last row (None if there is no row)
+    '''
+
+    with open(name, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+
+        # Bytes after the last newline seen so far
+        tail = b''
+        complete = False
+        while position > 0:
+            size = min(chunk, position)
+            position -= size
+
+            f.seek(position)
+            data = f.read(size)+tail
+
+            lines = data.split(b'\n')
+
+            # The first piece may continue in the previous chunk
+            tail = lines[0] if position > 0 else b''
+            lines = lines[1:] if position > 0 else lines
+
+            for line in reversed(lines):
+
+                # The piece after the last newline of the file
+                if not complete:
+                    complete = True
+                    continue
+
+                values = row(line.decode(errors='replace'), ncolumns)
+                if values is not None:
+                    return values
+
+    return None
+
+
+def value(log, inputfile, column):
+    '''
+    Give one column of the last thermo row of a run.
+
+    inputs:
+        log = The location of the LAMMPS log file
+        inputfile = The location of the LAMMPS input file
+        column = The name of the thermo column
+
+    outputs:
+        number = The value of the column in the last row
+    '''
+
+    headers = columns(inputfile)
+    values = last(log, len(headers))
+
+    if values is None:
+        message = 'No thermo rows in '+log
+        raise ValueError(message)
+
+    number = values[headers.index(column)]
+
+    return number
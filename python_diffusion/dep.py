@@ -2,6 +2,8 @@
 Find pertinent information in LAMMPS input files.
 '''
 
+import archive
+
 
 def info(item):
     '''
@@ -10,7 +12,7 @@ def info(item):
 
     # Open file and iterate per line
     runsteps = []
-    with open(item) as file:
+    with archive.open(item) as file:
         for line in file:
             value = line.strip().split(' ')
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+from job import job
+
+import matplotlib
+import manifest
+import runner
+import sys
+import os
+
+jobs_dir = sys.argv[1]  # The job directories
+job_name = sys.argv[2]  # The generic name for jobs
+export_dir = sys.argv[3]  # The export directory
+datadirname = sys.argv[4]  # Name of data directory
+plotdirname = sys.argv[5]  # Name of plot directory
+
+trajdotlammpstrj = sys.argv[6]  # Trajectories
+testdotout = sys.argv[7]  # LAMMPS print to screen
+depdotin = sys.argv[8]  # Input file
+
+# Comma separated descriptors from: msd, diffusion, ico_at_tg
+descriptors = sys.argv[9].split(',')
+
+alpha = float(sys.argv[10])  # The significance level for t-test
+edges = int(sys.argv[11])  # The edges of interest
+faces = int(sys.argv[12])  # The face threshold for the edges of interest
+workers = int(sys.argv[13]) if len(sys.argv) > 13 else 1  # Processes
+
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[14] if len(sys.argv) > 14 else 'ovito'
+
+matplotlib.use('Agg')  # No display is needed
+
+known = ['msd', 'diffusion', 'ico_at_tg']
+unknown = [i for i in descriptors if i not in known]
+if unknown:
+    message = 'Unknown descriptors: '+', '.join(unknown)
+    raise ValueError(message)
+
+files = [depdotin, testdotout, trajdotlammpstrj]  # Inputs of each job
+
+# The parameters and data files of each descriptor
+parameters = {
+              'msd': {},
+              'diffusion': {'alpha': alpha},
+              'ico_at_tg': {
+                            'edges': edges,
+                            'faces': faces,
+                            'backend': backend
+                            },
+              }
+
+outputs = {
+           'msd': ['msd.txt'],
+           'diffusion': [
+                         'diffusion_mto.txt',
+                         'diffusion_mto_settled.txt',
+                         'diffusion_settled.txt',
+                         ],
+           'ico_at_tg': ['ico_at_tg.txt'],
+           }
+
+
+def analyze(path):
+    '''
+    Calculate every requested descriptor for a job that is not up to date.
+    The input, thermo and trajectory files are parsed once and the binary
+    trajectory cache is shared by all descriptors.
+
+    inputs:
+        path = The path of the job
+    '''
+
+    run = job(path, export_dir, datadirname, plotdirname)
+
+    inputs = [os.path.join(path, i) for i in files]
+
+    todo = []
+    for descriptor in descriptors:
+        if manifest.current(
+                            run.datapath,
+                            descriptor,
+                            inputs,
+                            parameters[descriptor]
+                            ):
+            print('Up to date: '+descriptor)
+            continue
+
+        todo.append(descriptor)
+
+    if not todo:
+        return 'skipped'
+
+    run.input_file(depdotin)
+    run.sys(testdotout)
+    run.box(trajdotlammpstrj)
+
+    for descriptor in todo:
+        if descriptor == 'msd':
+            run.msd()
+
+        elif descriptor == 'diffusion':
+            run.diffusion(alpha=alpha)
+
+        elif descriptor == 'ico_at_tg':
+            run.ico(edges=edges, faces=faces, backend=backend)
+
+        names = [os.path.join(run.datapath, i) for i in outputs[descriptor]]
+        manifest.write(
+                       run.datapath,
+                       descriptor,
+                       inputs,
+                       parameters[descriptor],
+                       names
+                       )
+
+    print('-'*79)
+
+
+logdir = os.path.join(export_dir, 'logs', 'diffusion_descriptors')
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(paths, analyze, workers, logdir, logdir+'_summary.txt')
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -20,24 +17,50 @@ trajdotlammpstrj = sys.argv[6]  # Trajectories
 testdotout = sys.argv[7]  # LAMMPS print to screen
 depdotin = sys.argv[8]  # Input file
 alpha = float(sys.argv[9])  # The significance level for t-test
+workers = int(sys.argv[10]) if len(sys.argv) > 10 else 1  # Processes
 
-# Loop for each path
-for item in os.walk(jobs_dir):
+files = [depdotin, testdotout, trajdotlammpstrj]  # Inputs of each job
 
-    path = item[0]
 
-    split = path.split('/')
+def analyze(path):
+    '''
+    Calculate MTO diffusion for a job.
 
-    # Filter for paths that contain jobs
-    if job_name not in split[-1]:
-        continue
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname, plotdirname)
 
+    inputs = [os.path.join(path, i) for i in files]
+    parameters = {'alpha': alpha}
+    if manifest.current(run.datapath, 'diffusion', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
+
     run.input_file(depdotin)
     run.sys(testdotout)
     run.box(trajdotlammpstrj)
 
     run.diffusion(alpha=alpha)
 
+    outputs = [
+               'diffusion_mto.txt',
+               'diffusion_mto_settled.txt',
+               'diffusion_settled.txt',
+               ]
+    outputs = [os.path.join(run.datapath, i) for i in outputs]
+    manifest.write(run.datapath, 'diffusion', inputs, parameters, outputs)
+
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'diffusion'),
+               os.path.join(export_dir, 'logs', 'diffusion_summary.txt')
+               )
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -22,24 +19,49 @@ depdotin = sys.argv[8]  # Input file
 
 edges = int(sys.argv[9])  # The edges of interest
 faces = int(sys.argv[10])  # The face threshold for the edges of interest
+workers = int(sys.argv[11]) if len(sys.argv) > 11 else 1  # Processes
 
-# Loop for each path
-for item in os.walk(jobs_dir):
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[12] if len(sys.argv) > 12 else 'ovito'
 
-    path = item[0]
+files = [depdotin, testdotout, trajdotlammpstrj]  # Inputs of each job
 
-    split = path.split('/')
 
-    # Filter for paths that contain jobs
-    if job_name not in split[-1]:
-        continue
+def analyze(path):
+    '''
+    Calculate the ICO fraction near Tg for a job.
+
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname, plotdirname)
 
+    inputs = [os.path.join(path, i) for i in files]
+    parameters = {'edges': edges, 'faces': faces, 'backend': backend}
+    if manifest.current(run.datapath, 'ico_at_tg', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
+
     run.input_file(depdotin)
     run.sys(testdotout)
     run.box(trajdotlammpstrj)
 
-    run.ico(edges=edges, faces=faces)
+    run.ico(edges=edges, faces=faces, backend=backend)
+
+    outputs = ['ico_at_tg.txt']
+    outputs = [os.path.join(run.datapath, i) for i in outputs]
+    manifest.write(run.datapath, 'ico_at_tg', inputs, parameters, outputs)
 
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'ico_at_tg'),
+               os.path.join(export_dir, 'logs', 'ico_at_tg_summary.txt')
+               )
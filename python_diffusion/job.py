@@ -1,23 +1,11 @@
-from PyQt5 import QtGui  # Added to be able to import ovito
+from scipy.stats import linregress, ttest_ind, sem
 
-from matplotlib import pyplot as pl
-
-from scipy.stats import linregress, sem, ttest_ind
-from functools import reduce
-
-import pymatgen as mg
 import pandas as pd
-import scipy as sc
 import numpy as np
 
-import ast
 import os
 
-from ovito.modifiers import CalculateDisplacementsModifier
-from ovito.modifiers import VoronoiAnalysisModifier
-from ovito.modifiers import PythonScriptModifier
-from ovito.io import import_file
-
+import pipeline
 import traj
 import test
 import dep
@@ -38,33 +26,42 @@ def autocovariance(x, n, mean, k, bias=0):
             autocov = the autocovariance at a k-lag
     '''
 
-    autocov = 0.0
-    for i in np.arange(0, n-k):
-        autocov += (x[i+k]-mean)*(x[i]-mean)
+    x = np.asarray(x, dtype=np.float64)
 
+    autocov = np.dot(x[k:n]-mean, x[:n-k]-mean)
     autocov /= n-bias
 
     return autocov
 
 
-def autocorrelation(x):
+def autocorrelation(x, max_lag=None):
     '''
-    Compute the autocorrelation for all possible k-lags.
+    Compute the autocorrelation for all possible k-lags. The autocovariance
+    of every lag comes from one FFT of the zero padded data.
 
     inputs:
             x = the data
+            max_lag = the largest k-lag returned (all lags if None)
     outputs:
             r = the autocorrelation at a k-lag
     '''
 
+    x = np.asarray(x, dtype=np.float64)
+
     n = len(x)  # Number of values
     mean = np.mean(x)  # Mean values
-    denominator = autocovariance(x, n, mean, 0)  # Normalization factor
-    k = np.arange(0, n+1)  # k-lag
 
-    r = list(map(lambda lag: autocovariance(x, n, mean, lag)/denominator, k))
+    size = 2**int(np.ceil(np.log2(2*n)))  # Zero padding avoids wrapping
+    f = np.fft.rfft(x-mean, size)
+    autocov = np.fft.irfft(f*np.conj(f), size)[:n]/n
+
+    r = autocov/autocov[0]  # Normalization factor
+    r = np.append(r, 0.0)  # No pairs of values at the k-lag of n
 
-    return r
+    if max_lag is not None:
+        r = r[:max_lag+1]
+
+    return list(r)
 
 
 def batch_means(x, k):
@@ -135,54 +132,87 @@ def self_diffusion(x, y):
     return d
 
 
-def msdmodify(frame, data):
+def correlate(x, w):
     '''
-    Access the per-particle displacement magnitudes computed by an existing
-    Displacement Vectors modifier that precedes this custom modifier in the
-    data pipeline. This loops over for all and each particle type.
+    Cross-correlate weights with data along the first axis using FFTs.
 
     inputs:
-        frame = the frame for trajectories considered
-        data = a pipeline variable for data
+        x = the data with time along the first axis
+        w = the weights for each lag
+    outputs:
+        c = sum over l of w[l]*x[j+l] for each j where all lags fit in x
     '''
 
-    elements = [i.id for i in data.particles['Particle Type'].types]
+    n = x.shape[0]
+    m = w.shape[0]
 
-    # Calculate diplacements
-    dispmag = data.particles['Displacement Magnitude'].array
+    size = 2**int(np.ceil(np.log2(n+m)))  # Zero padding avoids wrapping
 
-    # Compute MSD for all atoms
-    msd = {'all': np.sum(dispmag**2)/len(dispmag)}
+    fw = np.conj(np.fft.rfft(w, size))
+    fw = fw.reshape((-1,)+(1,)*(x.ndim-1))
 
-    # Compute MSD for a type of atom
-    for item in elements:
-        index = (data.particles['Particle Type'] == item)
-        msd[item] = np.sum(dispmag[index]**2)/len(dispmag[index])
+    c = np.fft.irfft(np.fft.rfft(x, size, axis=0)*fw, size, axis=0)
+    c = c[:n-m+1]
 
-    # Export msd
-    data.attributes['msd'] = msd
+    return c
 
 
-def gather_msd(node, start, stop):
+def mto_slopes(positions, x, cut, chunk=1000):
     '''
-    Calculate MSD for all and each element type.
+    Calculate the slope of the MSD against time for every time origin. Each
+    origin j uses the lags 1 to cut and the least squares slope is a weighted
+    sum of squared displacements, so every origin is computed at once with
+    FFT cross-correlations.
 
     inputs:
-        node = the loaded trajectories from Ovito
-        start = the starting frame
-        stop = the stopping frame
+        positions = unwrapped positions with shape (frames, atoms, 3)
+        x = the time for each lag used in the fit
+        cut = the number of time origins and lags
+        chunk = the number of atoms transformed at a time
+    outputs:
+        slopes = the summed MSD slope of all atoms for each time origin
+    '''
+
+    # Least squares weights for the slope of each lag
+    w = (x-np.mean(x))/np.sum((x-np.mean(x))**2)
+    w = np.concatenate(([0.0], w))  # No weight for lag zero
+
+    slopes = np.zeros(cut)
+    for i in range(0, positions.shape[1], chunk):
+        r = np.asarray(positions[:, i:i+chunk], dtype=np.float64)
+        r = r-r.mean(axis=0)  # Displacements do not depend on the center
+
+        squares = np.sum(r**2, axis=(1, 2))
+        cross = correlate(r, w)[:cut]
+
+        slopes += correlate(squares, w)[:cut]
+        slopes -= 2.0*np.sum(r[:cut]*cross, axis=(1, 2))
+        slopes += squares[:cut]*np.sum(w)
+
+    return slopes
+
+
+def reference_msd(positions, types):
+    '''
+    Calculate MSD for all and each element type with respect to the first
+    frame.
+
+    inputs:
+        positions = unwrapped positions with shape (frames, atoms, 3)
+        types = the type of each atom
     outputs:
         dfmsd = dataframe for msd
     '''
 
-    # The variables where data will be held
-    msd = []
+    # Squared displacements from the first frame
+    sd = np.sum((positions-positions[0])**2, axis=2)
 
-    # Compute the MSD for each frame of interest
-    for frame in range(start, stop+1):
+    # Compute MSD for all atoms
+    msd = {'all': sd.mean(axis=1)}
 
-        out = node.compute(frame)
-        msd.append(ast.literal_eval(out.attributes['msd']))
+    # Compute MSD for a type of atom
+    for item in np.unique(types):
+        msd[item] = sd[:, types == item].mean(axis=1)
 
     dfmsd = pd.DataFrame(msd)
 
@@ -211,6 +241,7 @@ class job:
 
         # Save paths
         export_path = os.path.join(export, path.strip('../'))
+        self.exportpath = export_path
 
         if data_path:
             self.datapath = os.path.join(export_path, data_path)
@@ -267,8 +298,14 @@ class job:
         file_system = os.path.join(self.path, testdotout)  # Output file
         self.file_system = file_system
 
-        # Thermodynamic data from test.out file
-        self.dfsys = test.info(file_system)
+        # Thermodynamic data from test.out file kept in a cache
+        if not os.path.exists(self.exportpath):
+            os.makedirs(self.exportpath, exist_ok=True)
+
+        cache = testdotout.replace('/', '_')+'.thermo.npz'
+        cache = os.path.join(self.exportpath, cache)
+
+        self.dfsys = test.cached(file_system, cache)
 
         self.dfsys['time'] = self.dfsys['Step']*self.timestep
 
@@ -302,9 +339,9 @@ class job:
 
         self.dftraj['time'] = self.dftraj['Step']*self.timestep
 
-        # The number of frames where temperatures where recorded
+        # The number of frames where temperatures where recorded (from 0)
         frames = list(range(self.dftraj.shape[0]))
-        self.dftraj['frame'] = np.array(frames)+1
+        self.dftraj['frame'] = frames
 
     def msd(self, write=True, plot=True, verbose=True):
         '''
@@ -331,12 +368,13 @@ class job:
         df = self.dftraj[condition]
         df = df.reset_index(drop=True)
 
-        # The beggining frame
+        # Slice the frames of the hold from the binary trajectory cache
         frames = df['frame'].values
-        start = frames[0]
-        stop = frames[-1]
+        data = traj.load(self.file_trajs)
 
-        dfmsd = gather_msd(self.file_trajs, start, stop)
+        positions = data['positions'][frames[0]:frames[-1]+1]
+        positions = positions.astype(np.float64)
+        dfmsd = reference_msd(positions, data['types'])
 
         cols = [list(dfmsd.columns)[0]]+self.elements
         cols = cols[:len(dfmsd.columns)]
@@ -349,6 +387,7 @@ class job:
             dfmsd.to_csv(msd_path, index=False)
 
         if plot:
+            from matplotlib import pyplot as pl
 
             fig, ax = pl.subplots()
 
@@ -408,63 +447,44 @@ class job:
         # Reset time
         df['time'] = df['time']-df['time'][0]
 
-        frames = df['frame'].values
-
         # Split data in half
-        cut = frames.shape[0]//2
-        split1 = frames[:cut]
-
-        number = split1.shape[0]
-        split2 = frames[cut:cut+number]
+        cut = df.shape[0]//2
+        number = cut  # Each origin uses the next cut frames
 
         # Each of the time origins
         time_origins = df['time'].values[:cut]
         time_endings = df['time'].values[cut:cut+number]
 
-        # Load input data and create an ObjectNode with a data pipeline.
-        node = import_file(self.file_trajs, multiple_frames=True)
-
-        # Calculate per-particle displacements with respect to a start
-        modifier = CalculateDisplacementsModifier()
-        modifier.assume_unwrapped_coordinates = True
-        modifier.reference.load(self.file_trajs)
-        node.modifiers.append(modifier)
-
-        # Insert custom modifier into the data pipeline.
-        node.modifiers.append(PythonScriptModifier(function=msdmodify))
+        # Slice the frames of the hold from the binary trajectory cache
+        hold = df['frame'].values
+        trajectories = traj.load(self.file_trajs)
 
-        # Collect diffusion coefficients
-        data = []
+        positions = trajectories['positions'][hold[0]:hold[-1]+1]
+        types = np.asarray(trajectories['types'])
 
-        count = 1
-        for start, stop in zip(split1, split2):
-
-            if verbose:
-                print(
-                      'Calculating diffusion from time origin: ' +
-                      str(count) +
-                      '/'+str(number)
-                      )
-
-            # Change the reference frame for MSD
-            node.modifiers[0].reference_frame = start
-            dfmsd = gather_msd(node, start, stop)
-
-            cols = [list(dfmsd.columns)[0]]+self.elements
-            cols = cols[:len(dfmsd.columns)]
-            dfmsd.columns = cols
+        if verbose:
+            print(
+                  'Calculating diffusion from '+str(number) +
+                  ' time origins'
+                  )
 
-            # Remove first value which is always zero
-            dfmsd = dfmsd.loc[1:, :]
+        # Calculate diffusion for all and each element
+        data = {'all': np.zeros(number)}
+        for item in np.unique(types):
+            index = np.flatnonzero(types == item)
+            slopes = mto_slopes(positions[:, index], time_origins, number)
 
-            # Calculate diffusion for each element and all
-            d = dfmsd.apply(lambda i: self_diffusion(time_origins, i))
-            data.append(d)
+            data['all'] += slopes
+            data[item] = slopes/index.shape[0]/6.0  # Degrees of freedom
 
-            count += 1
+        data['all'] /= types.shape[0]*6.0
 
         dfdif = pd.DataFrame(data)
 
+        cols = ['all']+self.elements
+        cols = cols[:len(dfdif.columns)]
+        dfdif.columns = cols
+
         # Truncate data based on two sided t-test
         settled_dif = dfdif.apply(lambda i: settle_test(i, alpha))
 
@@ -515,6 +535,7 @@ class job:
                              )
 
         if plot:
+            from matplotlib import pyplot as pl
 
             # Plot MTO diffusion
             fig, ax = pl.subplots(2)
@@ -608,6 +629,7 @@ class job:
             edges,
             faces,
             threshold=0.1,
+            backend='ovito',
             write=True,
             verbose=True
             ):
@@ -619,6 +641,7 @@ class job:
             edges = the number of VP edges
             faces = the number of minimum faces for the specified edges
             threshold = the maximum length for a VP edge
+            backend = compute with OVITO (ovito) or SciPy (native)
             write = whether or not to save the fractions and temperatures
             verbose = Wheter or not to print calculation status
 
@@ -642,23 +665,13 @@ class job:
         # Reset time
         df['time'] = df['time']-df['time'][0]
 
-        # Load input data and create an ObjectNode with a data pipeline.
-        node = import_file(self.file_trajs, multiple_frames=True)
-
-        voro = VoronoiAnalysisModifier(
-                                       compute_indices=True,
-                                       use_radii=False,
-                                       edge_threshold=threshold
-                                       )
-
-        node.modifiers.append(voro)
-
-        vp_indexes = []
-        for frame in df['frame'][:3]:
-            out = node.compute(frame)
-
-            indexes = out.particle_properties['Voronoi Index'].array
-            vp_indexes.append(indexes)
+        # Compute the Voronoi indexes of the first frames
+        vp_indexes = pipeline.voronoi_indexes(
+                                              self.file_trajs,
+                                              df['frame'].values[:3],
+                                              threshold,
+                                              backend
+                                              )
 
         # Combine all the frames
         vp_indexes = [pd.DataFrame(i) for i in vp_indexes]
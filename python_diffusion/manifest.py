@@ -0,0 +1,123 @@
+'''
+Record the inputs, parameters and outputs of each descriptor of a job so
+that reruns only compute descriptors that are stale.
+'''
+
+import archive
+import json
+import os
+
+
+def location(datapath, descriptor):
+    '''
+    Give the location of the manifest of a descriptor.
+
+    inputs:
+        datapath = The directory where the descriptor is saved
+        descriptor = The name of the descriptor
+
+    outputs:
+        name = The location of the manifest
+    '''
+
+    name = os.path.join(datapath, descriptor+'_manifest.json')
+
+    return name
+
+
+def stamps(inputs):
+    '''
+    Gather the size and modification time of input files. Archive members
+    take the values of their archive.
+
+    inputs:
+        inputs = The locations of the input files
+
+    outputs:
+        stamp = The size and modification time of each input file
+    '''
+
+    stamp = {}
+    for name in inputs:
+        stamp[name] = archive.stat(name)
+
+    return stamp
+
+
+def current(datapath, descriptor, inputs, parameters):
+    '''
+    Check whether a descriptor was computed from the same input files with
+    the same parameters and whether all of its outputs still exist.
+
+    inputs:
+        datapath = The directory where the descriptor is saved
+        descriptor = The name of the descriptor
+        inputs = The locations of the input files
+        parameters = The parameters of the descriptor
+
+    outputs:
+        condition = True if the descriptor is up to date
+    '''
+
+    name = location(datapath, descriptor)
+
+    if not os.path.isfile(name):
+        return False
+
+    try:
+        with open(name) as file:
+            saved = json.load(file)
+
+        stamp = stamps(inputs)
+
+    except (OSError, ValueError):
+        return False
+
+    # Compare parameters as they are stored
+    parameters = json.loads(json.dumps(parameters))
+
+    if saved.get('parameters') != parameters:
+        return False
+
+    if saved.get('inputs') != stamp:
+        return False
+
+    for output in saved.get('outputs', []):
+        if not os.path.isfile(output):
+            return False
+
+    return True
+
+
+def write(datapath, descriptor, inputs, parameters, outputs):
+    '''
+    Save the manifest of a descriptor once it is computed. The manifest is
+    written to a temporary file first so that an interrupted run never
+    leaves a partial manifest.
+
+    inputs:
+        datapath = The directory where the descriptor is saved
+        descriptor = The name of the descriptor
+        inputs = The locations of the input files
+        parameters = The parameters of the descriptor
+        outputs = The locations of the output files
+
+    outputs:
+        name = The location of the manifest
+    '''
+
+    name = location(datapath, descriptor)
+
+    saved = {
+             'inputs': stamps(inputs),
+             'parameters': parameters,
+             'outputs': list(outputs),
+             }
+
+    temporary = name+'.'+str(os.getpid())
+    with open(temporary, 'w') as outfile:
+        json.dump(saved, outfile, indent=4)
+
+    os.replace(temporary, name)
+
+    return name
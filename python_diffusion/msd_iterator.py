@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -19,24 +16,46 @@ plotdirname = sys.argv[5]  # Name of plot directory
 trajdotlammpstrj = sys.argv[6]  # Trajectories
 testdotout = sys.argv[7]  # LAMMPS print to screen
 depdotin = sys.argv[8]  # Input file
+workers = int(sys.argv[9]) if len(sys.argv) > 9 else 1  # Processes
 
-# Loop for each path
-for item in os.walk(jobs_dir):
+files = [depdotin, testdotout, trajdotlammpstrj]  # Inputs of each job
 
-    path = item[0]
 
-    split = path.split('/')
+def analyze(path):
+    '''
+    Calculate MSD for a job.
 
-    # Filter for paths that contain jobs
-    if job_name not in split[-1]:
-        continue
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname, plotdirname)
 
+    inputs = [os.path.join(path, i) for i in files]
+    parameters = {}
+    if manifest.current(run.datapath, 'msd', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
+
     run.input_file(depdotin)
     run.sys(testdotout)
     run.box(trajdotlammpstrj)
 
     run.msd()
 
+    outputs = ['msd.txt']
+    outputs = [os.path.join(run.datapath, i) for i in outputs]
+    manifest.write(run.datapath, 'msd', inputs, parameters, outputs)
+
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'msd'),
+               os.path.join(export_dir, 'logs', 'msd_summary.txt')
+               )
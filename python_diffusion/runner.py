@@ -0,0 +1,164 @@
+'''
+Run the analysis of independent jobs in a pool of processes.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+
+import pandas as pd
+
+import traceback
+import time
+import os
+
+
+def find(jobs_dir, name):
+    '''
+    Find all the job directories before any analysis starts.
+
+    inputs:
+        jobs_dir = The directory containing all jobs
+        name = The generic name of job directories
+
+    outputs:
+        paths = The paths of the jobs
+    '''
+
+    paths = []
+    for item in os.walk(jobs_dir):
+
+        path = item[0]
+
+        split = path.split('/')
+
+        # Filter for paths that contain jobs
+        if name not in split[-1]:
+            continue
+
+        paths.append(path)
+
+    return paths
+
+
+def task(func, path, logdir=None):
+    '''
+    Run the analysis of one job. Failures are recorded instead of stopping
+    the other jobs. The analysis can return 'skipped' for a job that is
+    already up to date.
+
+    inputs:
+        func = The function that analyzes a job given its path
+        path = The path of the job
+        logdir = The directory for a log file of the job (print if None)
+
+    outputs:
+        row = The path, status, run time, log file, and error of the job
+    '''
+
+    start = time.time()
+
+    log = None
+    if logdir:
+        log = '_'.join(path.strip('./').split('/'))+'.log'
+        log = os.path.join(logdir, log)
+
+    status = 'done'
+    error = ''
+    try:
+        if log:
+            with open(log, 'w') as out:
+                with redirect_stdout(out), redirect_stderr(out):
+                    result = func(path)
+
+        else:
+            result = func(path)
+
+        if result == 'skipped':
+            status = 'skipped'
+
+    except Exception:
+        status = 'failed'
+        error = traceback.format_exc()
+
+        if log:
+            with open(log, 'a') as out:
+                out.write(error)
+
+        else:
+            print(error)
+
+    row = {
+           'path': path,
+           'status': status,
+           'seconds': time.time()-start,
+           'log': log,
+           'error': error.strip().split('\n')[-1],
+           }
+
+    return row
+
+
+def run(paths, func, workers=1, logdir=None, summary=None):
+    '''
+    Analyze jobs one after another or spread over a pool of processes. Each
+    worker imports the analysis modules the first time it runs a job. With
+    more than one worker the printed output of each job goes to its own log
+    file. Scripts call this under a main guard because workers started with
+    spawn or forkserver import the script again.
+
+    inputs:
+        paths = The paths of the jobs
+        func = The function that analyzes a job given its path
+        workers = The number of processes
+        logdir = The directory for the log files of each job
+        summary = The file where the status of all jobs is saved
+
+    outputs:
+        df = The status of all jobs
+    '''
+
+    if workers < 2:
+        logdir = None
+
+    if logdir and not os.path.exists(logdir):
+        os.makedirs(logdir)
+
+    rows = []
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(task, func, i, logdir) for i in paths]
+
+            count = 1
+            for future in futures:
+                row = future.result()
+                rows.append(row)
+
+                print(
+                      row['status'].capitalize()+' ('+str(count)+'/' +
+                      str(len(paths))+'): '+row['path']
+                      )
+
+                count += 1
+
+    else:
+        for path in paths:
+            rows.append(task(func, path))
+
+    columns = ['path', 'status', 'seconds', 'log', 'error']
+    df = pd.DataFrame(rows, columns=columns)
+
+    if summary:
+        summarydir = os.path.dirname(summary)
+        if summarydir and not os.path.exists(summarydir):
+            os.makedirs(summarydir)
+
+        df.to_csv(summary, index=False)
+
+    failed = df[df['status'] == 'failed'].shape[0]
+    skipped = df[df['status'] == 'skipped'].shape[0]
+    print(
+          'Analyzed '+str(df.shape[0])+' jobs with ' +
+          str(failed)+' failures and '+str(skipped)+' up to date'
+          )
+
+    return df
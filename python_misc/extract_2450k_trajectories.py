@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ProcessPoolExecutor
 from os.path import join
 
+import archive
+import traj
 import sys
 import os
 
@@ -13,16 +16,67 @@ inputname = sys.argv[4]  # The name for the LAMMPS input file
 trajname = sys.argv[5]  # The name for the trajectories file
 
 exportdir = sys.argv[6]  # Directory to save trajectories
+workers = int(sys.argv[7]) if len(sys.argv) > 7 else 1  # Processes
 
-# Create generator object to iterate through jobs
-for path, subdirs, files in os.walk(datadir):
 
-    split = path.split('/')
-    if jobname not in split[-1]:
-        continue
+def copy_range(source, start, end, name, chunk=2**24):
+    '''
+    Copy a byte range of a file into a new file. The kernel copies the bytes
+    with copy_file_range or sendfile when they are available.
 
-    if stepset != split[-2]:
-        continue
+    inputs:
+        source = The location of the original file
+        start = The position of the first byte
+        end = The position after the last byte
+        name = The location of the new file
+        chunk = The largest number of bytes copied at a time
+    '''
+
+    # Archive members can only be read through Python
+    if archive.split(source)[0] is not None:
+        with archive.open(source, 'rb') as infile, open(name, 'wb') as outfile:
+            infile.seek(start)
+            while start < end:
+                data = infile.read(min(chunk, end-start))
+                outfile.write(data)
+                start += len(data)
+
+        return
+
+    with open(source, 'rb') as infile, open(name, 'wb') as outfile:
+        fdin = infile.fileno()
+        fdout = outfile.fileno()
+
+        while start < end:
+            count = min(chunk, end-start)
+
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    copied = os.copy_file_range(fdin, fdout, count, start)
+
+                except OSError:
+                    copied = os.sendfile(fdout, fdin, start, count)
+
+            else:
+                copied = os.sendfile(fdout, fdin, start, count)
+
+            if copied == 0:
+                message = 'Unexpected end of file in '+source
+                raise ValueError(message)
+
+            start += copied
+
+
+def split(path):
+    '''
+    Write each frame of the 2450 K hold of a job into its own file.
+
+    inputs:
+        path = The path of the job
+
+    outputs:
+        count = The number of frames written
+    '''
 
     # Paths to files
     inputfile = join(path, inputname)
@@ -30,58 +84,61 @@ for path, subdirs, files in os.walk(datadir):
 
     # Gather the steps for when he 2450 K hold occurs
     holds = []
-    with open(inputfile) as f:
+    with archive.open(inputfile) as f:
         for line in f:
             values = line.split(' ')
             values = [i for i in values if i != '']
 
-            if values[0] == 'run':
+            if values and (values[0] == 'run'):
                 holds.append(int(values[1].strip('\n')))
 
     hold1 = sum(holds[:3])  # Preparation holds
     hold2 = sum(holds[:4])  # Hold at 2450 K
 
-    # Parse trajectory file for 2450 K hold
-    with open(trajfile) as f:
+    # Frame byte offsets from a single scan of the trajectory file
+    df, columns = traj.index(trajfile)
 
-        case = 0  # Determine what the next line is
-        for line in f:
-            if 'ITEM: TIMESTEP' in line:
-                case = 1
-                continue
+    condition = (df['Step'] >= hold1) & (df['Step'] <= hold2)
+    df = df[condition]
+
+    for step, start, end in df[['Step', 'start', 'end']].values:
+
+        export = join(*[
+                        exportdir,
+                        path.replace(datadir, '').lstrip('/'),
+                        '2450k_minimization',
+                        str(step)
+                        ])
+
+        print('Creating: '+export)
 
-            if case == 1:
-                step = int(line)
-                case = 0
+        if not os.path.exists(export):
+            os.makedirs(export, exist_ok=True)
 
-                # Condition to cut trajectories
-                if (step >= hold1) & (step <= hold2):
-                    condition = True
+        copy_range(trajfile, start, end, join(export, 'traj.lammpstrj'))
 
-                    export = join(*[
-                                    exportdir,
-                                    path.replace(datadir, ''),
-                                    '2450k_minimization',
-                                    str(step)
-                                    ])
+    return df.shape[0]
 
-                    print('Creating: '+export)
 
-                    if not os.path.exists(export):
-                        os.makedirs(export)
+if __name__ == '__main__':
+    # Gather the jobs to split
+    paths = []
+    for path, subdirs, files in os.walk(datadir):
 
-                    name = join(export, 'traj.lammpstrj')
+        split_path = path.split('/')
+        if jobname not in split_path[-1]:
+            continue
 
-                    # The file to dump data into
-                    w = open(name, 'w')
-                    w.write('ITEM: TIMESTEP\n')
+        if stepset != split_path[-2]:
+            continue
 
-                else:
-                    condition = False
+        paths.append(path)
 
-            if not condition:
-                continue
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            counts = list(pool.map(split, paths))
 
-            w.write(line)
+    else:
+        counts = [split(path) for path in paths]
 
-        w.close()
+    print('Wrote '+str(sum(counts))+' frames from '+str(len(paths))+' jobs')
@@ -4,14 +4,114 @@
 A script to extract files from Ben's runs
 '''
 
-from shutil import copyfile
+from concurrent.futures import ProcessPoolExecutor
 from os.path import join
 import tarfile
+import shutil
 import sys
 import os
 
 
-def iterator(path, outdir, compressed, folders, files, depth):
+def current(name, size, mtime):
+    '''
+    Check whether a file was already written with the same size and
+    modification time.
+
+    inputs:
+        name = The location of the file
+        size = The expected size
+        mtime = The expected modification time
+
+    outputs:
+        condition = True if the file is up to date
+    '''
+
+    if not os.path.isfile(name):
+        return False
+
+    stat = os.stat(name)
+    condition = (stat.st_size == size) and (int(stat.st_mtime) == int(mtime))
+
+    return condition
+
+
+def extract(archive, directory, files, chunk=2**20):
+    '''
+    Stream the needed members of an archive to disk. The archive is read
+    once from start to end and members are copied in chunks so that memory
+    does not grow with the size of a member.
+
+    inputs:
+        archive = The location of the archive
+        directory = The export directory for the members
+        files = List of needed files
+        chunk = The number of bytes copied at a time
+
+    outputs:
+        count = The number of files written
+    '''
+
+    count = 0
+    with tarfile.open(archive, 'r|*') as tar:
+        for member in tar:
+            if member.name not in files:
+                continue
+
+            name = join(directory, member.name)
+
+            if current(name, member.size, member.mtime):
+                print('Up to date: '+name)
+                continue
+
+            # Create the path
+            if not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+            print('Creating: '+name)
+
+            # Write a partial file first so an interrupted copy is redone
+            temporary = name+'.part'
+            with open(temporary, 'wb') as outfile:
+                shutil.copyfileobj(tar.extractfile(member), outfile, chunk)
+
+            os.utime(temporary, (member.mtime, member.mtime))
+            os.replace(temporary, name)
+
+            count += 1
+
+    return count
+
+
+def copy(source, name):
+    '''
+    Copy a file unless the copy already has the same size and modification
+    time.
+
+    inputs:
+        source = The location of the original file
+        name = The location of the copy
+
+    outputs:
+        count = The number of files written
+    '''
+
+    stat = os.stat(source)
+    if current(name, stat.st_size, stat.st_mtime):
+        print('Up to date: '+name)
+        return 0
+
+    # Create the path
+    directory = os.path.dirname(name)
+    if not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    print('Creating: '+name)
+    shutil.copy2(source, name)
+
+    return 1
+
+
+def iterator(path, outdir, compressed, folders, files, depth, workers=1):
     '''
     Search for all possible files to copy for Tg analysis.
 
@@ -21,39 +121,24 @@ def iterator(path, outdir, compressed, folders, files, depth):
         compressed = List of compressed files
         files = List of needed files
         depth = The depth for directory naming convention
+        workers = The number of processes extracting archives
 
     outputs:
         A collection of data files
     '''
 
-    # Look for all directories as generator object
-    paths = os.walk(path)
-    extensions = [i.split('.')[-1] for i in files]
-
-    # Loop for each path
-    for item in paths:
+    archives = []
+    copies = []
+    for item in os.walk(path):
         for tar in compressed:
             if tar not in item[2]:
                 continue
 
-            archive = tarfile.open(join(item[0], tar), 'r')
-            for member in archive.getmembers():
-                if member.name not in files:
-                    continue
-
-                name = item[0].split('/')
-                name = name[-depth:]
-                name = join(outdir, *name)
-
-                # Create the path
-                if not os.path.exists(name):
-                    os.makedirs(name)
+            name = item[0].split('/')
+            name = name[-depth:]
+            name = join(outdir, *name)
 
-                name = join(name, member.name)
-
-                print('Creating: '+name)
-                content = archive.extractfile(member).read()
-                open(name, 'wb').write(content)
+            archives.append((join(item[0], tar), name))
 
         for folder in folders:
             if folder not in item[0]:
@@ -65,16 +150,34 @@ def iterator(path, outdir, compressed, folders, files, depth):
 
                 name = item[0].split('/')
                 name = name[-depth-1:]+item[1]
-                name = join(outdir, *name)
+                name = join(outdir, *name, f)
+
+                copies.append((join(item[0], f), name))
+
+    count = 0
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                       pool.submit(extract, archive, name, files)
+                       for archive, name in archives
+                       ]
 
-                # Create the path
-                if not os.path.exists(name):
-                    os.makedirs(name)
+            futures += [
+                        pool.submit(copy, source, name)
+                        for source, name in copies
+                        ]
 
-                name = join(name, f)
+            for future in futures:
+                count += future.result()
 
-                print('Creating: '+name)
-                copyfile(join(item[0], f), name)
+    else:
+        for archive, name in archives:
+            count += extract(archive, name, files)
+
+        for source, name in copies:
+            count += copy(source, name)
+
+    print('Wrote '+str(count)+' files')
 
 
 # The name of important files for each job
@@ -93,5 +196,8 @@ files = [
          '100k_minimize_template.in'
          ]
 
-# Extract data
-iterator(sys.argv[1], sys.argv[2], compressed, folders, files, 5)
+if __name__ == '__main__':
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1  # Processes
+
+    # Extract data
+    iterator(sys.argv[1], sys.argv[2], compressed, folders, files, 5, workers)
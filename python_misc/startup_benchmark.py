@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+'''
+A script to record the import time of each analysis entry point
+'''
+
+from os.path import join
+import subprocess
+import sys
+import os
+
+import pandas as pd
+
+# The modules imported by each entry point
+entries = [
+           ('python_rc', 'job'),
+           ('python_rc', 'pipeline'),
+           ('python_diffusion', 'job'),
+           ('python_diffusion', 'pipeline'),
+           ('python_variance', 'job'),
+           ('python_2450k_minimization', 'calculations_2450k_minimization'),
+           ]
+
+# Heavy packages that should only load when a method needs them
+heavy = ['PyQt5', 'ovito', 'pymatgen', 'matplotlib.pyplot', 'scipy.spatial']
+
+
+def importtime(directory, module):
+    '''
+    Import a module in a fresh interpreter and gather the import times.
+
+    inputs:
+        directory = The directory containing the module
+        module = The name of the module
+
+    outputs:
+        row = The total import time and the heavy packages loaded
+    '''
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = directory+os.pathsep+env.get('PYTHONPATH', '')
+
+    command = [sys.executable, '-X', 'importtime', '-c', 'import '+module]
+    out = subprocess.run(
+                         command,
+                         cwd=directory,
+                         env=env,
+                         stderr=subprocess.PIPE,
+                         universal_newlines=True
+                         )
+
+    # Lines look like: import time: self [us] | cumulative | package
+    loaded = {}
+    for line in out.stderr.split('\n'):
+        if not line.startswith('import time:'):
+            continue
+
+        line = line.split('|')
+        if len(line) != 3:
+            continue
+
+        try:
+            cumulative = int(line[1])
+        except ValueError:
+            continue
+
+        loaded[line[2].strip()] = cumulative
+
+    row = {
+           'directory': os.path.basename(directory),
+           'module': module,
+           'status': 'done' if out.returncode == 0 else 'failed',
+           'seconds': loaded.get(module, 0)/1e6,
+           }
+
+    for package in heavy:
+        row[package] = package in loaded
+
+    return row
+
+
+root = sys.argv[1]  # The location of the repository
+export = sys.argv[2]  # The file where import times are saved
+repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3  # Runs per module
+
+rows = []
+for directory, module in entries:
+    for repeat in range(repeats):
+        row = importtime(join(root, directory), module)
+        row['repeat'] = repeat
+        rows.append(row)
+
+        print(
+              row['directory']+'/'+module+' ('+str(repeat+1)+'/' +
+              str(repeats)+'): '+str(row['seconds'])+' [s]'
+              )
+
+df = pd.DataFrame(rows)
+df.to_csv(export, index=False)
@@ -0,0 +1,581 @@
+'''
+Import the steps that are printed onto a trajectory file.
+'''
+
+import pandas as pd
+import numpy as np
+
+import archive
+import io
+import os
+
+# Columns stored for each frame in the sidecar index
+index_columns = [
+                 'Step',
+                 'natoms',
+                 'xlo',
+                 'xhi',
+                 'ylo',
+                 'yhi',
+                 'zlo',
+                 'zhi',
+                 'start',
+                 'data',
+                 'end',
+                 ]
+
+# Atom columns that hold integers
+integer_columns = ['id', 'type', 'mol', 'proc', 'ix', 'iy', 'iz']
+
+# Indexes already loaded by this process
+indexes = {}
+
+# Last frames already loaded by this process
+lasts = {}
+
+
+def scan(file, chunk=2**24):
+    '''
+    Find the header of every frame in one pass over a trajectory file. A
+    last frame with fewer complete atom lines than atoms was cut by the end
+    of the file and is left out.
+
+    inputs:
+        file = An open binary file object of the trajectory file
+        chunk = The number of bytes read at a time
+
+    outputs:
+        frames = The index values of each frame (see index_columns)
+        columns = The names of the atom columns
+    '''
+
+    marker = b'ITEM: TIMESTEP'
+
+    frames = []
+    columns = []
+
+    buffer = b''
+    base = 0  # The file position of the start of the buffer
+    pos = 0  # The buffer position where the search continues
+    eof = False
+
+    lines = 0  # The complete lines after the last header
+    counted = 0  # The file position where counting lines continues
+    while True:
+
+        # Find a complete frame header in the buffer
+        start = buffer.find(marker, pos)
+        stop = -1
+        if start != -1:
+            stop = buffer.find(b'ITEM: ATOMS', start)
+
+        if stop != -1:
+            stop = buffer.find(b'\n', stop)
+
+        # Read more data if the header is not complete
+        if stop == -1:
+            if eof:
+                break
+
+            if start == -1:
+                keep = max(len(buffer)-len(marker), pos)
+            else:
+                keep = start
+
+            # Count the lines of the last frame before dropping them
+            if frames:
+                lines += buffer.count(b'\n', counted-base, keep)
+                counted = max(counted, base+keep)
+
+            buffer = buffer[keep:]
+            base += keep
+            pos = 0
+
+            data = file.read(chunk)
+            if not data:
+                eof = True
+
+            buffer += data
+            continue
+
+        header = buffer[start:stop].decode().split('\n')
+
+        step = int(header[1])
+        natoms = int(header[3])
+
+        # Box boundaries
+        box = []
+        for line in header[5:8]:
+            box += [float(i) for i in line.split()[:2]]
+
+        if not columns:
+            columns = header[8].split()[2:]
+
+        frames.append([step, natoms]+box+[base+start, base+stop+1])
+        pos = stop+1
+
+        lines = 0
+        counted = base+pos
+
+    size = base+len(buffer)
+
+    # Leave out a last frame that was cut
+    if frames:
+        lines += buffer.count(b'\n', counted-base)
+        if lines < frames[-1][1]:
+            size = frames[-1][-2]
+            frames = frames[:-1]
+
+    # A frame ends where the next one begins
+    ends = [i[-2] for i in frames[1:]]+[size]
+    frames = [i+[j] for i, j in zip(frames, ends)]
+
+    return frames, columns
+
+
+def index(name):
+    '''
+    Load the frame index of a trajectory file. The index is built with a
+    single pass over the file and saved next to it as name.index.npz. The
+    saved index is rebuilt when the size or modification time of the
+    trajectory file changes.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        df = The step, atom count, box boundaries, and byte offsets per frame
+        columns = The names of the atom columns
+    '''
+
+    source = np.array(archive.stat(name))
+
+    # Reuse an index already loaded by this process
+    if name in indexes:
+        loaded, df, columns = indexes[name]
+        if np.array_equal(loaded, source):
+            return df, columns
+
+    sidecar = archive.sidecar(name, '.index.npz')
+
+    df = None
+    if os.path.isfile(sidecar):
+        with np.load(sidecar) as saved:
+            if np.array_equal(saved['source'], source):
+                df = pd.DataFrame(saved['frames'], columns=index_columns)
+                columns = list(saved['columns'])
+
+    if df is None:
+        with archive.open(name, 'rb') as file:
+            frames, columns = scan(file)
+
+        frames = np.array(frames, dtype=np.float64).reshape(-1, 11)
+        df = pd.DataFrame(frames, columns=index_columns)
+
+        # Save for later runs if the directory allows it. The index is
+        # written to a temporary file first so that other processes never
+        # read a partial index.
+        temporary = sidecar+'.'+str(os.getpid())
+        try:
+            with open(temporary, 'wb') as outfile:
+                np.savez(
+                         outfile,
+                         frames=frames,
+                         columns=np.array(columns),
+                         source=source
+                         )
+
+            os.replace(temporary, sidecar)
+
+        except OSError:
+            pass
+
+    integers = ['Step', 'natoms', 'start', 'data', 'end']
+    df[integers] = df[integers].astype(np.int64)
+
+    indexes[name] = (source, df, columns)
+
+    return df, columns
+
+
+def read_frames(name, frames, file=None):
+    '''
+    Load the atoms of frames into a structured array. Each atom block is read
+    as one byte range from the frame index and converted in bulk. Atoms are
+    sorted by id so that rows match between frames.
+
+    inputs:
+        name = The location of the trajectory file
+        frames = The frame numbers (position in the file) to load
+        file = An open binary file object of the trajectory file to reuse
+
+    outputs:
+        atoms = The atom columns with shape (frames, atoms)
+    '''
+
+    df, columns = index(name)
+
+    frames = np.atleast_1d(frames)
+    natoms = np.unique(df['natoms'].values[frames])
+
+    if natoms.shape[0] > 1:
+        message = 'Frames need the same number of atoms.'
+        raise ValueError(message)
+
+    natoms = natoms[0] if natoms.shape[0] else 0
+
+    atoms = np.empty((frames.shape[0], natoms), dtype=dtypes(columns))
+
+    starts = df['data'].values[frames]
+    ends = df['end'].values[frames]
+
+    # Read in file order so compressed archives only move forward
+    order = np.argsort(starts, kind='stable')
+
+    opened = file is None
+    if opened:
+        file = archive.open(name, 'rb')
+
+    try:
+        previous = None
+        for i, start, end in zip(order, starts[order], ends[order]):
+
+            # A frame asked for twice is only read once
+            if start != previous:
+                file.seek(start)
+                values = parse(file.read(end-start), columns, natoms)
+                previous = start
+
+            for j, column in enumerate(columns):
+                atoms[column][i] = values[:, j]
+
+    finally:
+        if opened:
+            file.close()
+
+    return atoms
+
+
+def dtypes(columns):
+    '''
+    Give the type of each atom column.
+
+    inputs:
+        columns = The names of the atom columns
+
+    outputs:
+        dtype = The structured array type of the atoms
+    '''
+
+    dtype = [
+             (i, np.int64) if i in integer_columns else (i, np.float64)
+             for i in columns
+             ]
+
+    return dtype
+
+
+def parse(data, columns, natoms):
+    '''
+    Convert the atom block of a frame in bulk and sort atoms by id.
+
+    inputs:
+        data = The bytes of the atom block
+        columns = The names of the atom columns
+        natoms = The number of atoms
+
+    outputs:
+        values = The atom values with shape (atoms, columns)
+    '''
+
+    ncolumns = len(columns)
+
+    values = np.fromstring(data, sep=' ')
+    values = values[:natoms*ncolumns].reshape(natoms, ncolumns)
+
+    if 'id' in columns:
+        order = np.argsort(values[:, columns.index('id')])
+        values = values[order]
+
+    return values
+
+
+def tail(name, chunk=2**20):
+    '''
+    Find the last complete frame by reading backwards from the end of a
+    trajectory file. Only the bytes of the last frames are read. Members of
+    compressed archives cannot be read backwards and use the frame index.
+
+    inputs:
+        name = The location of the trajectory file
+        chunk = The number of bytes read at a time
+
+    outputs:
+        frame = The index values of the last frame (see index_columns)
+        columns = The names of the atom columns
+    '''
+
+    if archive.compressed(name):
+        df, columns = index(name)
+
+        if df.shape[0] == 0:
+            message = 'No complete frame in '+name
+            raise ValueError(message)
+
+        frame = [df[i].values[-1].item() for i in index_columns]
+
+        return frame, columns
+
+    marker = b'ITEM: TIMESTEP'
+
+    with archive.open(name, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+
+        buffer = b''
+        base = size  # The file position of the start of the buffer
+        stop = None  # Only search before a frame that was incomplete
+        while True:
+
+            start = buffer.rfind(marker, 0, stop)
+
+            # Read more data if no frame begins in the buffer
+            if start == -1:
+                if base == 0:
+                    message = 'No complete frame in '+name
+                    raise ValueError(message)
+
+                read = min(chunk, base)
+                base -= read
+                file.seek(base)
+
+                if stop is not None:
+                    stop += read
+
+                buffer = file.read(read)+buffer
+                continue
+
+            frames, columns = scan(io.BytesIO(buffer[start:]))
+
+            # The header can be cut by the end of the file
+            if not frames:
+                stop = start
+                continue
+
+            frame = frames[0]
+            frame[-3:] = [base+start+i for i in frame[-3:]]
+
+            # Use the previous frame when the atom block is cut
+            values = buffer[frame[-2]-base:frame[-1]-base].split()
+            if len(values) < frame[1]*len(columns):
+                stop = start
+                continue
+
+            return frame, columns
+
+
+def last(name):
+    '''
+    Load the last complete frame of a trajectory file with tail. The frame
+    is kept for later calls in this process until the file changes.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        df = The index values of the last frame
+        atoms = The atom columns with shape (1, atoms)
+    '''
+
+    source = np.array(archive.stat(name))
+
+    if name in lasts:
+        loaded, df, atoms = lasts[name]
+        if np.array_equal(loaded, source):
+            return df, atoms
+
+    frame, columns = tail(name)
+
+    df = pd.DataFrame([frame], columns=index_columns)
+
+    natoms = frame[1]
+    atoms = np.empty((1, natoms), dtype=dtypes(columns))
+
+    with archive.open(name, 'rb') as file:
+        file.seek(frame[-2])
+        values = parse(file.read(frame[-1]-frame[-2]), columns, natoms)
+
+    for j, column in enumerate(columns):
+        atoms[column][0] = values[:, j]
+
+    lasts[name] = (source, df, atoms)
+
+    return df, atoms
+
+
+def coordinates(atoms):
+    '''
+    Stack the positions of atoms loaded with read_frames. Unwrapped
+    coordinates are used when the trajectory contains them.
+
+    inputs:
+        atoms = The atom columns from read_frames
+
+    outputs:
+        positions = The positions with shape (frames, atoms, 3)
+    '''
+
+    columns = atoms.dtype.names
+    if 'xu' in columns:
+        names = ['xu', 'yu', 'zu']
+    else:
+        names = ['x', 'y', 'z']
+
+    positions = np.stack([atoms[i] for i in names], axis=-1)
+
+    return positions
+
+
+def convert(name, chunk=100):
+    '''
+    Write a binary cache of a trajectory file into the directory name.cache.
+    Positions are stored as float32 and types as int8 in .npy files that can
+    be memory mapped. The size and modification time of the trajectory file
+    are saved last so an interrupted conversion is treated as stale.
+
+    inputs:
+        name = The location of the trajectory file
+        chunk = The number of frames converted at a time
+
+    outputs:
+        cache = The location of the cache directory
+    '''
+
+    df, columns = index(name)
+
+    cache = archive.sidecar(name, '.cache')
+    if not os.path.exists(cache):
+        os.makedirs(cache)
+
+    # Invalidate the previous cache before writing over it
+    source = os.path.join(cache, 'source.npy')
+    if os.path.isfile(source):
+        os.remove(source)
+
+    nframes = df.shape[0]
+    natoms = int(df['natoms'].max()) if nframes else 0
+
+    positions = np.lib.format.open_memmap(
+                                          os.path.join(cache, 'positions.npy'),
+                                          mode='w+',
+                                          dtype=np.float32,
+                                          shape=(nframes, natoms, 3)
+                                          )
+
+    types = np.zeros(natoms, dtype=np.int8)
+    ids = np.arange(1, natoms+1)
+
+    # Frames are read in file order so compressed archives are only
+    # decompressed once
+    with archive.open(name, 'rb') as file:
+        for start in range(0, nframes, chunk):
+            frames = np.arange(start, min(start+chunk, nframes))
+            atoms = read_frames(name, frames, file)
+            positions[frames] = coordinates(atoms)
+
+            if start == 0:
+                types = atoms['type'][0].astype(np.int8)
+                ids = atoms['id'][0]
+
+    positions.flush()
+    del positions
+
+    box = df[['xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']].values
+
+    np.save(os.path.join(cache, 'types.npy'), types)
+    np.save(os.path.join(cache, 'ids.npy'), ids)
+    np.save(os.path.join(cache, 'box.npy'), box)
+    np.save(os.path.join(cache, 'steps.npy'), df['Step'].values)
+
+    np.save(source, np.array(archive.stat(name)))
+
+    return cache
+
+
+def load(name):
+    '''
+    Memory map the binary cache of a trajectory file. The cache is built
+    with convert when it is missing or older than the trajectory file.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        data = The positions, types, ids, box, and steps arrays
+    '''
+
+    cache = archive.sidecar(name, '.cache')
+    source = os.path.join(cache, 'source.npy')
+
+    current = np.array(archive.stat(name))
+
+    if not (
+            os.path.isfile(source) and
+            np.array_equal(np.load(source), current)
+            ):
+        convert(name)
+
+    data = {}
+    for key in ['positions', 'types', 'ids', 'box', 'steps']:
+        data[key] = np.load(os.path.join(cache, key+'.npy'), mmap_mode='r')
+
+    return data
+
+
+def info(name):
+    '''
+    Gather the steps where trajectories were dumped and the volume dimensions.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        df = The parsed parameters of interest
+        counts = The number of types of atoms
+    '''
+
+    dfindex, columns = index(name)
+
+    df = dfindex[['Step', 'xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']].copy()
+
+    # Gather the number of elements from the first frame
+    counts = {}  # The counts for the types of atoms
+    if dfindex.shape[0] > 0:
+        types = read_frames(name, 0)['type'][0]
+        types, number = np.unique(types, return_counts=True)
+        counts = dict(zip(types.tolist(), number.tolist()))
+
+    return df, counts
+
+
+def last_info(name):
+    '''
+    Gather the step, volume dimensions and types of atoms of the last frame
+    without reading the rest of the trajectory file.
+
+    inputs:
+        name = The location of the trajectory file
+
+    outputs:
+        df = The parsed parameters of interest
+        counts = The number of types of atoms
+    '''
+
+    dflast, atoms = last(name)
+
+    df = dflast[['Step', 'xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']].copy()
+
+    types, number = np.unique(atoms['type'][0], return_counts=True)
+    counts = dict(zip(types.tolist(), number.tolist()))
+
+    return df, counts
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -16,23 +13,41 @@ trajdotlammpstrj = sys.argv[3]  # Trajectories
 depdotin = sys.argv[4]  # Input file
 export_dir = sys.argv[5]  # The export directory
 datadirname = sys.argv[6]  # Name of data directory
+workers = int(sys.argv[7]) if len(sys.argv) > 7 else 1  # Processes
 
-# Loop for each path
-for item in os.walk(jobs_dir):
 
-    path = item[0]
+def analyze(path):
+    '''
+    Calculate the APD of the last frame for a job.
 
-    split = path.split('/')
-
-    # Filter for paths that contain jobs
-    if datadir_name not in split[-1]:
-        continue
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname)
 
     traj = os.path.join(path, trajdotlammpstrj)
     dep = os.path.join(path, depdotin)
 
+    inputs = [traj, dep]
+    if manifest.current(run.datapath, 'apd', inputs, {}):
+        print('Up to date: '+path)
+        return 'skipped'
+
     run.apd_last(traj, dep)
 
+    outputs = [os.path.join(run.datapath, 'apd_last.txt')]
+    manifest.write(run.datapath, 'apd', inputs, {}, outputs)
+
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, datadir_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'apd'),
+               os.path.join(export_dir, 'logs', 'apd_summary.txt')
+               )
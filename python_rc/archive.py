@@ -0,0 +1,312 @@
+'''
+Read files stored inside tar archives without extracting them. A member is
+named by the archive path followed by the member path, for example
+job/outputs.tar.gz/traj.lammpstrj. Plain files are read as usual.
+'''
+
+import tarfile
+import json
+import io
+import os
+
+# Archive suffixes recognized in paths
+suffixes = ('.tar', '.tar.gz', '.tgz')
+
+# Member offsets of uncompressed archives already loaded by this process
+members = {}
+
+
+def split(name):
+    '''
+    Split a path into an archive and a member path.
+
+    inputs:
+        name = The location of a file or of an archive member
+
+    outputs:
+        archive = The location of the archive (None for plain files)
+        member = The member path inside the archive (name for plain files)
+    '''
+
+    if os.path.exists(name):
+        return None, name
+
+    parts = os.path.normpath(name).split(os.sep)
+    for i in range(1, len(parts)):
+        archive = os.sep.join(parts[:i])
+
+        if archive.endswith(suffixes) and os.path.isfile(archive):
+            member = '/'.join(parts[i:])
+
+            return archive, member
+
+    return None, name
+
+
+def stat(name):
+    '''
+    Give the size and modification time of a file. Members take the values
+    of their archive.
+
+    inputs:
+        name = The location of a file or of an archive member
+
+    outputs:
+        stamp = The size and modification time
+    '''
+
+    archive, member = split(name)
+    stat = os.stat(archive if archive else name)
+
+    return [stat.st_size, stat.st_mtime]
+
+
+def sidecar(name, suffix):
+    '''
+    Give the location of a file saved next to a file or an archive member.
+
+    inputs:
+        name = The location of a file or of an archive member
+        suffix = The suffix of the saved file
+
+    outputs:
+        location = The location of the saved file
+    '''
+
+    archive, member = split(name)
+
+    if archive is None:
+        return name+suffix
+
+    return archive+'.'+member.replace('/', '_')+suffix
+
+
+def compressed(name):
+    '''
+    Check whether a path is a member of a compressed archive. These members
+    can only be read from start to end.
+
+    inputs:
+        name = The location of a file or of an archive member
+
+    outputs:
+        condition = True for members of compressed archives
+    '''
+
+    archive, member = split(name)
+
+    condition = (archive is not None) and (not archive.endswith('.tar'))
+
+    return condition
+
+
+def offsets(archive):
+    '''
+    Load the data offset and size of each member of an uncompressed archive.
+    The offsets are gathered by reading member headers only and are saved
+    next to the archive as archive.members.json. They are gathered again
+    when the archive changes.
+
+    inputs:
+        archive = The location of the uncompressed archive
+
+    outputs:
+        found = The data offset and size of each member
+    '''
+
+    source = stat(archive)
+
+    if archive in members:
+        loaded, found = members[archive]
+        if loaded == source:
+            return found
+
+    saved = archive+'.members.json'
+
+    found = None
+    if os.path.isfile(saved):
+        try:
+            with io.open(saved) as file:
+                data = json.load(file)
+
+            if data['source'] == source:
+                found = data['members']
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+    if found is None:
+        found = {}
+        with tarfile.open(archive, 'r:') as tar:
+            for item in tar:
+                if item.isfile():
+                    path = os.path.normpath(item.name)
+                    found[path] = [item.offset_data, item.size]
+
+        # Save for later runs if the directory allows it
+        temporary = saved+'.'+str(os.getpid())
+        try:
+            with io.open(temporary, 'w') as outfile:
+                json.dump({'source': source, 'members': found}, outfile)
+
+            os.replace(temporary, saved)
+
+        except OSError:
+            pass
+
+    members[archive] = (source, found)
+
+    return found
+
+
+class member(io.RawIOBase):
+    '''
+    A read only view of a byte range of another file object. Views of
+    compressed streams only move forward because going back would
+    decompress the archive again from its start.
+    '''
+
+    def __init__(self, file, start, size, owners=(), forward=False):
+        '''
+        Define the byte range of the view.
+
+        inputs:
+            self = The object reference
+            file = The file object holding the bytes
+            start = The position of the first byte
+            size = The number of bytes
+            owners = The objects closed with the view
+            forward = Whether or not backward seeks are refused
+        '''
+
+        self.file = file
+        self.start = start
+        self.size = size
+        self.owners = owners
+        self.forward = forward
+        self.position = 0
+        self.offset = None  # The position of file when known
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        '''
+        Move the position of the view.
+        '''
+
+        if whence == os.SEEK_CUR:
+            offset += self.position
+
+        elif whence == os.SEEK_END:
+            offset += self.size
+
+        offset = min(max(offset, 0), self.size)
+
+        if self.forward and (offset < self.position):
+            message = (
+                       'Cannot seek backwards in a member of a compressed ' +
+                       'archive; extract the archive first'
+                       )
+            raise ValueError(message)
+
+        self.position = offset
+
+        return self.position
+
+    def readinto(self, buffer):
+        '''
+        Read bytes of the range into a buffer.
+        '''
+
+        count = min(len(buffer), self.size-self.position)
+        if count <= 0:
+            return 0
+
+        # Only move the file when another view or a seek moved it
+        if self.offset != self.start+self.position:
+            self.file.seek(self.start+self.position)
+
+        data = self.file.read(count)
+
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.offset = self.start+self.position
+
+        return len(data)
+
+    def close(self):
+        '''
+        Close the view and the files it was opened from.
+        '''
+
+        if not self.closed:
+            for owner in self.owners:
+                owner.close()
+
+        super().close()
+
+
+def open(name, mode='r'):
+    '''
+    Open a file or an archive member for reading. Members of uncompressed
+    archives are read directly from the archive with their saved offsets.
+    Members of compressed archives are found by decompressing the archive
+    up to the member and can only be read from start to end.
+
+    inputs:
+        name = The location of a file or of an archive member
+        mode = Read text (r) or bytes (rb)
+
+    outputs:
+        file = The open file object
+    '''
+
+    archive, path = split(name)
+
+    if archive is None:
+        return io.open(name, mode)
+
+    path = os.path.normpath(path)
+
+    if archive.endswith('.tar'):
+        found = offsets(archive)
+
+        if path not in found:
+            message = 'No member '+path+' in '+archive
+            raise ValueError(message)
+
+        raw = io.open(archive, 'rb')
+        start, size = found[path]
+        view = member(raw, start, size, (raw,))
+
+    else:
+        tar = tarfile.open(archive, 'r:gz')
+
+        # Stop decompressing at the member
+        item = None
+        for i in tar:
+            if os.path.normpath(i.name) == path:
+                item = i
+                break
+
+        if item is None:
+            tar.close()
+            message = 'No member '+path+' in '+archive
+            raise ValueError(message)
+
+        extracted = tar.extractfile(item)
+        view = member(extracted, 0, item.size, (extracted, tar), True)
+
+    file = io.BufferedReader(view, 2**20)
+
+    if 'b' not in mode:
+        file = io.TextIOWrapper(file)
+
+    return file
@@ -0,0 +1,124 @@
+'''
+Look up element radii and volumes from a table generated once with pymatgen.
+'''
+
+import os
+
+# The table saved next to this module
+table_name = os.path.join(
+                          os.path.dirname(os.path.abspath(__file__)),
+                          'elements.csv'
+                          )
+
+# Table already loaded by this process
+table = {}
+
+
+def generate(name=table_name):
+    '''
+    Write the radius and sphere volume of every element known to pymatgen.
+    The metallic radius is used when available and the atomic radius
+    otherwise. Elements without either are left out.
+
+    inputs:
+        name = The location of the table
+
+    outputs:
+        rows = The number of elements written
+    '''
+
+    import warnings
+
+    try:
+        from pymatgen.core import Element
+
+    except ImportError:
+        from pymatgen import Element
+
+    from job import volume_sphere
+
+    # Write a temporary file first so that a partial table is never read
+    temporary = name+'.'+str(os.getpid())
+
+    rows = 0
+    with open(temporary, 'w') as outfile:
+        outfile.write('element,radius,volume\n')
+
+        for element in Element:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+
+                try:
+                    radius = element.metallic_radius  # in Am
+
+                except Exception:
+                    radius = None
+
+                if radius is None:
+                    radius = element.atomic_radius  # in Am
+
+            if radius is None:
+                continue
+
+            radius = float(radius)
+            volume = volume_sphere(radius)  # in Am^3
+
+            outfile.write(
+                          element.symbol+',' +
+                          repr(radius)+',' +
+                          repr(volume)+'\n'
+                          )
+
+            rows += 1
+
+    os.replace(temporary, name)
+    table.clear()
+
+    return rows
+
+
+def load(name=table_name):
+    '''
+    Load the element table once per process.
+
+    inputs:
+        name = The location of the table
+
+    outputs:
+        table = The radius and volume of each element symbol
+    '''
+
+    if table:
+        return table
+
+    with open(name) as file:
+        next(file)  # Skip the header
+        for line in file:
+            symbol, radius, volume = line.strip().split(',')
+            table[symbol] = {'radius': float(radius), 'volume': float(volume)}
+
+    return table
+
+
+def lookup(symbol):
+    '''
+    Find the radius and sphere volume of an element.
+
+    inputs:
+        symbol = The element symbol
+
+    outputs:
+        properties = The radius [Am] and volume [Am^3] of the element
+    '''
+
+    properties = load()
+
+    if symbol not in properties:
+        message = 'No radius available for element: '+str(symbol)
+        raise ValueError(message)
+
+    return properties[symbol]
+
+
+if __name__ == '__main__':
+    generate()
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -19,23 +16,45 @@ datadirname = sys.argv[6]  # Name of data directory
 
 edges = int(sys.argv[7])  # The edges of interest
 faces = int(sys.argv[8])  # The face threshold for the edges of interest
+workers = int(sys.argv[9]) if len(sys.argv) > 9 else 1  # Processes
 
-# Loop for each path
-for item in os.walk(jobs_dir):
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[10] if len(sys.argv) > 10 else 'ovito'
 
-    path = item[0]
 
-    split = path.split('/')
+def analyze(path):
+    '''
+    Calculate the ICO fraction at low T for a job.
 
-    # Filter for paths that contain jobs
-    if datadir_name not in split[-1]:
-        continue
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname)
 
     traj = os.path.join(path, trajdotlammpstrj)
     dep = os.path.join(path, depdotin)
 
-    run.ico(traj, dep, edges=edges, faces=faces)
+    inputs = [traj, dep]
+    parameters = {'edges': edges, 'faces': faces, 'backend': backend}
+    if manifest.current(run.datapath, 'ico_at_tlow', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
+
+    run.ico(traj, dep, edges=edges, faces=faces, backend=backend)
+
+    outputs = [os.path.join(run.datapath, 'ico_at_tlow.txt')]
+    manifest.write(run.datapath, 'ico_at_tlow', inputs, parameters, outputs)
 
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, datadir_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'ico_at_tlow'),
+               os.path.join(export_dir, 'logs', 'ico_at_tlow_summary.txt')
+               )
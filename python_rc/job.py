@@ -1,25 +1,19 @@
-from PyQt5 import QtGui  # Added to be able to import ovito
-
 from scipy.interpolate import UnivariateSpline
-from scipy.optimize import curve_fit
-
-from matplotlib import pyplot as pl
-
-from scipy.signal import argrelextrema
 import scipy as sc
 
-import pymatgen as mg
 import pandas as pd
 import numpy as np
 
+import warnings
 import os
 
-from ovito.modifiers import VoronoiAnalysisModifier
-from ovito.io import import_file
-
-from line_intersector import opt
+from line_intersector import opt, opt_batch
 
+import elements as elements_table
+import archive
+import pipeline
 import traj
+import vp
 import test
 import dep
 
@@ -29,7 +23,67 @@ def volume_sphere(r):
     Calculate of a sphere given a radius.
     '''
 
-    return 4.0/3.0*sc.pi*r**3.0
+    return 4.0/3.0*np.pi*r**3.0
+
+
+def spline_cut(x, y, max_temp, k=5, s=1):
+    '''
+    Fit a spline to the data below an upper temperature cutoff.
+
+    inputs:
+        x = The sorted temperatures
+        y = The E-3kT values
+        max_temp = The maximum temperature for analysis
+        k = The degree of the spline
+        s = The smoothing factor of the spline
+
+    outputs:
+        xcut = The temperatures below the cutoff
+        ycut = The E-3kT values below the cutoff
+        xfitcut = The temperatures where the spline is evaluated
+        yfitcut = The spline values
+    '''
+
+    # Cutoff region
+    condition = x <= max_temp
+    xcut = x[condition]
+    ycut = y[condition]
+
+    # Spline fit of cut region
+    spl = UnivariateSpline(x=xcut, y=ycut, k=k, s=s)
+    xfitcut = np.linspace(xcut[0], xcut[-1], 100)
+    yfitcut = spl(xfitcut)
+
+    return xcut, ycut, xfitcut, yfitcut
+
+
+def plateau(y, tol=5.0):
+    '''
+    Find the longest run of consecutive points where y changes by no more
+    than a tolerance between neighbors.
+
+    inputs:
+        y = The data ordered along the horizontal axis
+        tol = The largest change in y allowed between neighbors
+
+    outputs:
+        start = The index where the run starts
+        stop = The index where the run stops (inclusive)
+    '''
+
+    flat = np.abs(np.diff(y)) <= tol
+
+    start, stop = (0, 0)
+    first = 0  # The start of the current run
+    for i, condition in enumerate(flat):
+        if not condition:
+            first = i+1
+            continue
+
+        if i+1-first > stop-start:
+            start, stop = (first, i+1)
+
+    return start, stop
 
 
 class job:
@@ -54,6 +108,7 @@ class job:
 
         # Save paths
         export_path = os.path.join(export, path.strip('../'))
+        self.exportpath = export_path
 
         if data_path:
             self.datapath = os.path.join(export_path, data_path)
@@ -111,8 +166,14 @@ class job:
         file_system = os.path.join(self.path, testdotout)  # Output file
         self.file_system = file_system
 
-        # Thermodynamic data from test.out file
-        self.dfsys = test.info(file_system)
+        # Thermodynamic data from test.out file kept in a cache
+        if not os.path.exists(self.exportpath):
+            os.makedirs(self.exportpath, exist_ok=True)
+
+        cache = testdotout.replace('/', '_')+'.thermo.npz'
+        cache = os.path.join(self.exportpath, cache)
+
+        self.dfsys = test.cached(file_system, cache)
 
         self.dfsys['time'] = self.dfsys['Step']*self.timestep
 
@@ -156,15 +217,9 @@ class job:
         for key, count in counts.items():
             self.natoms += count
 
-            element = mg.Element(self.elements[key])
-
-            try:
-                atomicradii = element.metallic_radius  # in Am
-
-            except Exception:
-                atomicradii = element.atomic_radius  # in Am
-
-            atomicvol = volume_sphere(atomicradii)  # in Am^3
+            element = elements_table.lookup(self.elements[key])
+            atomicradii = element['radius']  # in Am
+            atomicvol = element['volume']  # in Am^3
 
             elements[self.elements[key]] = {
                                             'counts': count,
@@ -174,30 +229,18 @@ class job:
 
         dfelprops = pd.DataFrame(elements).T
 
-    def etg(
-            self,
-            max_temp=1000,
-            write=True,
-            plot=True,
-            verbose=True
-            ):
+    def cooling(self):
         '''
-        Calculate the glass transition temperature based on E-3kt.
+        Gather the E-3kT cooling curve sorted by temperature.
 
         inputs:
             self = The object reference
-            max_temp = The maximum temperature for analysis
-            write = Whether or not to save Tg
-            plot = Whether or not to save plot of data
-            verbose = Wheter or not to print calculation status
 
         outputs:
-            tg = The Tg
+            x = The temperatures
+            y = The E-3kT values
         '''
 
-        if verbose:
-            print('Calculating Tg from E-3kT')
-
         try:
             self.file_system
         except Exception:
@@ -227,16 +270,37 @@ class job:
         x = dfcool['Temp'].values
         y = dfcool['E-3kT'].values
 
-        # Cutoff region
-        condition = x <= max_temp
-        xcut = x[condition]
-        ycut = y[condition]
+        return x, y
+
+    def etg(
+            self,
+            max_temp=1000,
+            write=True,
+            plot=True,
+            verbose=True
+            ):
+        '''
+        Calculate the glass transition temperature based on E-3kt.
+
+        inputs:
+            self = The object reference
+            max_temp = The maximum temperature for analysis
+            write = Whether or not to save Tg
+            plot = Whether or not to save plot of data
+            verbose = Wheter or not to print calculation status
+
+        outputs:
+            tg = The Tg
+        '''
+
+        if verbose:
+            print('Calculating Tg from E-3kT')
+
+        x, y = self.cooling()
 
         # Spline fit of cut region
         k, s = (5, 1)
-        spl = UnivariateSpline(x=xcut, y=ycut, k=k, s=s)
-        xfitcut = np.linspace(xcut[0], xcut[-1], 100)
-        yfitcut = spl(xfitcut)
+        xcut, ycut, xfitcut, yfitcut = spline_cut(x, y, max_temp, k, s)
 
         tg, endpoints, middle_rmse = opt(xfitcut, yfitcut)
 
@@ -253,6 +317,7 @@ class job:
                 outfile.write(str(max_temp))
 
         if plot:
+            from matplotlib import pyplot as pl
 
             fig, ax = pl.subplots(2)
 
@@ -332,6 +397,165 @@ class job:
 
         return tg
 
+    def etg_sweep(self, temps, verbose=True):
+        '''
+        Calculate the glass transition temperature for many upper temperature
+        cutoffs. The cooling curve is prepared once and the line fits of all
+        cutoffs are done in one batch.
+
+        inputs:
+            self = The object reference
+            temps = The upper temperature cutoffs
+            verbose = Wheter or not to print calculation status
+
+        outputs:
+            tgs = The Tg for each cutoff
+        '''
+
+        if verbose:
+            print('Calculating Tg from E-3kT for '+str(len(temps))+' cutoffs')
+
+        x, y = self.cooling()
+
+        xfits = []
+        yfits = []
+        for max_temp in temps:
+            _, _, xfitcut, yfitcut = spline_cut(x, y, max_temp)
+            xfits.append(xfitcut)
+            yfits.append(yfitcut)
+
+        tgs, _, _ = opt_batch(np.array(xfits), np.array(yfits))
+
+        return tgs
+
+    def etg_cutoff(
+                   self,
+                   mode='auto',
+                   tol=5.0,
+                   fallback=1000,
+                   verbose=True
+                   ):
+        '''
+        Choose the upper temperature cutoff for Tg from a sweep of cutoffs.
+        The cutoff is either clicked on the plot of the sweep (manual) or
+        set to the middle of the longest Tg plateau (auto). A fixed cutoff
+        is used with a warning when no two neighboring Tgs are within the
+        tolerance.
+
+        inputs:
+            self = The object reference
+            mode = Click the cutoff (manual) or use the Tg plateau (auto)
+            tol = The largest Tg change between cutoffs in a plateau [K]
+            fallback = The cutoff used when there is no plateau [K]
+            verbose = Wheter or not to print calculation status
+
+        outputs:
+            tcut = The upper temperature cutoff
+        '''
+
+        from matplotlib import pyplot as pl
+
+        condition = self.dfsys['Step'] >= self.hold1
+        temps = self.dfsys[condition]['Temp'].values
+
+        min_t = temps[-6]  # Minimum number of points for spline to work
+        max_t = max(temps)
+
+        range_t = np.linspace(min_t, max_t, 100)
+
+        tgs = self.etg_sweep(range_t, verbose)
+
+        fig, ax = pl.subplots()
+
+        ax.plot(range_t, tgs, marker='.', linestyle='none', label='Data')
+
+        ax.set_xlabel('Upper Temperature Cutoff [K]')
+        ax.set_ylabel('Tg [K]')
+
+        ax.grid()
+
+        fig.tight_layout()
+
+        if mode == 'auto':
+
+            # Use the middle of the longest Tg plateau
+            start, stop = plateau(tgs, tol)
+            found = stop > start
+
+            if found:
+                tcut = range_t[(start+stop)//2]
+
+                ax.axvspan(
+                           range_t[start],
+                           range_t[stop],
+                           color='g',
+                           alpha=0.2,
+                           label='Tg Plateau (tolerance='+str(tol)+' [K])'
+                           )
+
+            else:
+                tcut = fallback
+
+                message = (
+                           'No Tg plateau within '+str(tol)+' [K] for ' +
+                           self.path+'; using the fixed cutoff ' +
+                           str(fallback)+' [K]'
+                           )
+                warnings.warn(message)
+
+            # Record the sweep and the decision
+            sweep = pd.DataFrame({'cutoff': range_t, 'tg': tgs})
+            sweep.to_csv(
+                         os.path.join(self.datapath, 'etg_sweep.txt'),
+                         index=False
+                         )
+
+            decision = {
+                        'mode': mode,
+                        'tolerance': tol,
+                        'plateau_start': range_t[start] if found else np.nan,
+                        'plateau_stop': range_t[stop] if found else np.nan,
+                        'plateau_points': stop-start+1 if found else 0,
+                        'plateau_tg_mean': (
+                                            np.mean(tgs[start:stop+1])
+                                            if found else np.nan
+                                            ),
+                        'fallback': not found,
+                        'cutoff': tcut,
+                        }
+
+            decision = pd.DataFrame([decision])
+
+            name = os.path.join(self.datapath, 'etg_temp_cutoff_auto.txt')
+            decision.to_csv(name, index=False)
+
+        else:
+
+            # Go full screen
+            mng = pl.get_current_fig_manager()
+            mng.full_screen_toggle()
+
+            click = fig.ginput(n=-1, mouse_add=1, mouse_pop=3)
+            tcut = click[-1][0]
+
+        ax.axvline(
+                   tcut,
+                   linestyle=':',
+                   color='k',
+                   label='Upper Temperature Cutoff: '+str(tcut)+' [K]'
+                   )
+
+        ax.legend(loc='upper center')
+
+        fig.savefig(os.path.join(self.plotpath, 'etg_temp_cutoff.png'))
+
+        pl.close('all')
+
+        if verbose:
+            print('Upper cutoff temperature set to '+str(tcut)+' [K]')
+
+        return tcut
+
     def apd_last(self, traj_path, in_path, write=True, verbose=True):
         '''
         Calculate the APD from the last trajectories.
@@ -349,7 +573,8 @@ class job:
         if verbose:
             print('Calculating APD from: '+traj_path)
 
-        df, counts = traj.info(traj_path)
+        # Only the last frame is read from the end of the file
+        df, counts = traj.last_info(traj_path)
 
         # Find the box lengths
         df['dx'] = df['xhi']-df['xlo']  # Am
@@ -360,7 +585,7 @@ class job:
 
         # Gather input file parameters
         allelements = {}
-        with open(in_path) as f:
+        with archive.open(in_path) as f:
             for line in f:
                 line = line.strip().split(' ')
                 if 'pair_coeff' in line:
@@ -377,15 +602,9 @@ class job:
         for key, count in counts.items():
             self.natoms += count
 
-            element = mg.Element(allelements[key])
-
-            try:
-                atomicradii = element.metallic_radius  # in Am
-
-            except Exception:
-                atomicradii = element.atomic_radius  # in Am
-
-            atomicvol = volume_sphere(atomicradii)  # in Am^3
+            element = elements_table.lookup(allelements[key])
+            atomicradii = element['radius']  # in Am
+            atomicvol = element['volume']  # in Am^3
 
             elements[allelements[key]] = {
                                           'counts': count,
@@ -417,6 +636,9 @@ class job:
                     write=True,
                     plot=True,
                     first=10,
+                    stride=1,
+                    workers=1,
+                    backend='ovito',
                     verbose=True
                     ):
         '''
@@ -427,6 +649,10 @@ class job:
             threshold = The maximum length for a VP edge
             write = Whether or not to save the fractions and temperatures
             plot = Whether or not to plot the fractions and temperatures
+            first = The number of most frequent VP to plot
+            stride = Use every stride frame of the hold
+            workers = The number of processes computing frames
+            backend = Compute with OVITO (ovito) or SciPy (native)
             verbose = Wheter or not to print calculation status
 
         outputs:
@@ -437,7 +663,7 @@ class job:
         if verbose:
             print(
                   'Calculating VP variety and ' +
-                  'variance at highest temperature hold'
+                  'variance at constant temperature hold'
                   )
 
         try:
@@ -454,51 +680,38 @@ class job:
             message = 'Need to specify input file.'
             raise ValueError(message)
 
-        try:
-            self.file_system
+        # Find the interval for the isothermal hold
+        cutoff1 = sum(self.runsteps[:3])
+        cutoff2 = sum(self.runsteps[:4])
 
-        except Exception:
-            message = 'Need to specify LAMMPS output file.'
-            raise ValueError(message)
-
-        # Merge dfsys and dftraj on matching steps
-        df = pd.merge(
-                      self.dfsys.loc[:, self.dfsys.columns != 'Volume'],
-                      self.dftraj, on=['Step', 'time']
-                      )
+        condition = (self.dftraj['Step'] >= cutoff1)
+        condition = condition & (self.dftraj['Step'] <= cutoff2)
 
-        interval = (sum(self.runsteps[:3]), sum(self.runsteps[:4]))
-        condition = (df['Step'] >= interval[0]) & (df['Step'] <= interval[1])
-        df = df[condition]
+        # Grab trajectory information from interval
+        df = self.dftraj[condition]
         df = df.reset_index(drop=True)
 
-        # Load input data and create an ObjectNode with a data pipeline.
-        node = import_file(self.file_trajs, multiple_frames=True)
-
-        voro = VoronoiAnalysisModifier(
-                                       compute_indices=True,
-                                       use_radii=False,
-                                       edge_threshold=threshold
-                                       )
-
-        node.modifiers.append(voro)
-
-        all_indexes = []
+        # Reset time
+        df['time'] = df['time']-df['time'][0]
+        df['frame'] = df['frame']-df['frame'][0]
+
+        # Compute the Voronoi indexes of frames over a pool of processes
+        all_indexes = pipeline.voronoi_frames(
+                                              self.file_trajs,
+                                              df['frame'].values[::stride],
+                                              threshold,
+                                              workers,
+                                              backend=backend
+                                              )
+
+        # Count the number of unique VP one frame at a time
+        vps = vp.histogram()
         frames = 0
-        for frame in df['frame']:
-            out = node.compute(frame)
-            indexes = out.particle_properties['Voronoi Index'].array
-            all_indexes.append(indexes)
+        for indexes in all_indexes:
+            vps.add(indexes)
             frames += 1
 
-        # Combine all the frames
-        all_indexes = [pd.DataFrame(i) for i in all_indexes]
-        df = pd.concat(all_indexes)
-        df = df.fillna(0)  # Make cure indexes are zero if not included
-        df = df.astype(int)  # Make sure all counts are integers
-
-        # Count the number of unique VP
-        coords, counts = np.unique(df.values, axis=0, return_counts=True)
+        coords, counts = vps.unique()
 
         # Standard notation
         coords = coords[:, 2:]
@@ -515,44 +728,78 @@ class job:
         fractions = counts/total
 
         # Calculate variance from list including ordered fractions of VP
-        variance = []
-        for i in range(1, counts.shape[0]):
-            variance.append(np.var(fractions[:i]))
+        variance, max_index = vp.cumulative_variance(fractions)
+        vptypes = np.arange(1, len(variance)+1)  # Types of vp
+
+        df_variance = {'number_of_vp': vptypes, 'variance': variance}
+        df_variance = pd.DataFrame(df_variance)
+        df_variance['number_of_vp'] = df_variance['number_of_vp'].astype(int)
 
-        variance = np.array(variance)  # Numpy array
+        max_variance = pd.DataFrame(df_variance.loc[max_index, :]).T
+        max_variance['number_of_vp'] = max_variance['number_of_vp'].astype(int)
 
         # Create a directory for the analysis files
         if write:
 
             # Export all variances calculated
-            np.savetxt(
-                       os.path.join(self.datapath, 'variance.txt'),
-                       variance,
-                       )
+            df_variance.to_csv(
+                               os.path.join(self.datapath, 'variance.txt'),
+                               index=False
+                               )
+
+            max_name = os.path.join(self.datapath, 'max_variance.txt')
+            max_variance.to_csv(max_name, index=False)
 
         if plot:
+            from matplotlib import pyplot as pl
 
             # Plot variance
-            fig, ax = pl.subplots()
-
-            ax.plot(
-                    np.arange(1, len(variance)+1),
-                    variance,
-                    marker='.',
-                    linestyle='none',
-                    label='Data for '+str(frames)+' frames'
-                    )
-
-            ax.set_ylabel('Variance of VP [-]')
-            ax.set_xlabel('Number of VP Types [-]')
-
-            ax.grid()
-            ax.legend()
-
-            fig.tight_layout()
-            fig.savefig(os.path.join(self.plotpath, 'variance.png'))
-
-            pl.close('all')
+            for i in [counts.shape[0], first]:
+                fig, ax = pl.subplots()
+
+                ax.plot(
+                        vptypes[:i],
+                        variance[:i],
+                        marker='.',
+                        linestyle='none',
+                        label='Data for '+str(frames)+' frames'
+                        )
+
+                coordinate = (
+                              max_variance['number_of_vp'].values[0],
+                              max_variance['variance'].values[0]
+                              )
+
+                vlinelabel = (
+                              'Max Variance: ' +
+                              str(coordinate)
+                              )
+                ax.axvline(
+                           max_variance['number_of_vp'].values[0],
+                           color='k',
+                           linestyle=':',
+                           label=vlinelabel
+                           )
+
+                ax.set_ylabel('Variance of VP [-]')
+                ax.set_xlabel('Number of VP Types [-]')
+
+                ax.grid()
+                ax.legend()
+
+                fig.tight_layout()
+
+                plotname = (
+                            'variance_top_' +
+                            str(i) +
+                            '_from_' +
+                            str(counts.shape[0]) +
+                            '.png'
+                            )
+
+                fig.savefig(os.path.join(self.plotpath, plotname))
+
+                pl.close('all')
 
             # Plot distribution of cluster types seen
             fig, ax = pl.subplots()
@@ -579,6 +826,7 @@ class job:
             edges,
             faces,
             threshold=0.1,
+            backend='ovito',
             write=True,
             verbose=True
             ):
@@ -592,6 +840,7 @@ class job:
             edges = the number of VP edges
             faces = the number of minimum faces for the specified edges
             threshold = the maximum length for a VP edge
+            backend = compute with OVITO (ovito) or SciPy (native)
             write = whether or not to save the fractions and temperatures
             verbose = Wheter or not to print calculation status
 
@@ -604,23 +853,9 @@ class job:
 
         edges -= 1  # Compensate for indexing
 
-        df, counts = traj.info(traj_path)
-        frame = df.index[-1]  # The last frame
-
-        # Load input data and create an ObjectNode with a data pipeline.
-        node = import_file(traj_path, multiple_frames=True)
-
-        voro = VoronoiAnalysisModifier(
-                                       compute_indices=True,
-                                       use_radii=False,
-                                       edge_threshold=threshold
-                                       )
-
-        node.modifiers.append(voro)
-
-        out = node.compute(frame)
+        # Compute the Voronoi indexes of the last frame
+        indexes = pipeline.last_indexes(traj_path, threshold, backend)
 
-        indexes = out.particle_properties['Voronoi Index'].array
         indexes = indexes[:, edges]  # Gather edge bin
 
         count = sum(indexes >= faces)  # Count condition
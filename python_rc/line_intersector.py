@@ -1,11 +1,6 @@
-from scipy.interpolate import UnivariateSpline as interpolate
-from matplotlib import pyplot as pl
-
 from scipy.stats import linregress
-from os.path import join
 
 import numpy as np
-import os
 
 
 def rmse(act, pred):
@@ -30,6 +25,111 @@ def rmse(act, pred):
     return e
 
 
+def fit_rmse(m, sx, sy, sxx, sxy, syy):
+    '''
+    Calculate the RMSE of a least squares line from sums over its points.
+    The sum of squared residuals is a difference of sums and loses its
+    digits when the line fits almost exactly, so those fits are flagged.
+
+    inputs:
+        m = The number of points
+        sx = The sum of x
+        sy = The sum of y
+        sxx = The sum of x*x
+        sxy = The sum of x*y
+        syy = The sum of y*y
+
+    outputs:
+        e = The RMSE
+        loose = Where the RMSE is not precise and needs a direct fit
+    '''
+
+    cxx = sxx-sx*sx/m
+    cxy = sxy-sx*sy/m
+    cyy = syy-sy*sy/m
+
+    sse = cyy-cxy*cxy/cxx  # Sum of squared residuals
+    loose = sse <= 1e-8*cyy
+
+    sse = np.clip(sse, 0.0, None)  # Remove negative rounding errors
+
+    e = np.sqrt(sse/m)
+
+    return e, loose
+
+
+def refit(e, loose, x, y, points):
+    '''
+    Replace the imprecise RMSE values of fit_rmse with direct line fits.
+
+    inputs:
+        e = The RMSE for each fit
+        loose = Where the RMSE needs a direct fit
+        x = Horizontal axis data
+        y = Vertical axis data
+        points = Gives the slice of points used by the fit at a position
+    '''
+
+    for index in zip(*np.nonzero(loose)):
+        curve = index[:-1]
+        fit = points(index[-1])
+
+        xfit = x[curve][fit]
+        yfit = y[curve][fit]
+
+        m, i, _, _, _ = linregress(xfit, yfit)
+        e[index] = rmse(yfit, m*xfit+i)
+
+
+def sliding_rmse(x, y):
+    '''
+    Calculate the left and right fit RMSE for every non-pivot point. The fits
+    use cumulative sums along the last axis, so all of them come out of one
+    pass and many curves can be stacked along leading axes.
+
+    inputs:
+        x = Horizontal axis data
+        y = Vertical axis data
+
+    outputs:
+        endpoints = The non-pivot x values from the last to the second point
+        middle_rmse = The average of the left and right RMSE at each endpoint
+    '''
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    n = x.shape[-1]  # The length of data
+
+    # Center data to limit rounding errors in the sums
+    xc = x-x.mean(axis=-1, keepdims=True)
+    yc = y-y.mean(axis=-1, keepdims=True)
+
+    sums = [xc, yc, xc*xc, xc*yc, yc*yc]
+    left = [np.cumsum(i, axis=-1) for i in sums]
+    total = [i[..., -1:] for i in left]
+
+    # Left fits use points 0 to p and right fits use points p to n-1
+    p = np.arange(1, n-1)
+    lsums = [i[..., p] for i in left]
+    rsums = [k-i[..., p-1] for i, k in zip(left, total)]
+
+    rmsel, loosel = fit_rmse(p+1, *lsums)  # Left RMSE
+    rmser, looser = fit_rmse(n-p, *rsums)  # Right RMSE
+
+    # Nearly exact fits like those of two points are done directly
+    refit(rmsel, loosel, xc, yc, lambda j: slice(0, p[j]+1))
+    refit(rmser, looser, xc, yc, lambda j: slice(p[j], n))
+
+    middle_rmse = (rmsel+rmser)/2  # Mean RMSE
+
+    # Order from the last non-pivot point to the first
+    endpoints = x[..., p[::-1]]
+    middle_rmse = middle_rmse[..., ::-1]
+
+    return endpoints, middle_rmse
+
+
 def opt(x, y):
     '''
     Linearely fit data from both ends of supplied data and calculate RMSE.
@@ -58,46 +158,31 @@ def opt(x, y):
         middlermse = The average RMSE
     '''
 
-    # Make data into numpy arrays
-    x = np.array(x)
-    y = np.array(y)
-
-    n = len(x)  # The length of data
-
-    ldata = []  # Left fits non-pivot and RMSE
-    rdata = []  # Right fits non-pivot and RMSE
-
-    for i in list(range(n-1)):
+    endpoints, middle_rmse = sliding_rmse(x, y)
 
-        # Left fit
-        xl = x[:n-i]
-        yl = y[:n-i]
+    mcut = np.argmin(middle_rmse)  # Minimum RMSE index
+    xcut = endpoints[mcut]  # x data with minimum RMSE
 
-        ml, il, _, _, _ = linregress(xl, yl)
-        yfitl = ml*xl+il
-        rmsel = rmse(yl, yfitl)  # Left RMSE
+    return xcut, endpoints, middle_rmse
 
-        # Right fit
-        xr = x[i:]
-        yr = y[i:]
 
-        mr, ir, _, _, _ = linregress(xr, yr)
-        yfitr = mr*xr+ir
-        rmser = rmse(yr, yfitr)  # Right RMSE
+def opt_batch(x, y):
+    '''
+    Apply opt to many curves at once.
 
-        # Exclude pivot points from data
-        if i > 0:
-            ldata.append((xl[-1], rmsel))
-            rdata.append((xr[0], rmser))
+    inputs:
+        x = Horizontal axis data with one curve per row
+        y = Vertical axis data with one curve per row
 
-    # Align data based on pivot point
-    ldata = np.array(ldata)
-    rdata = np.array(rdata[::-1])
+    outputs:
+        xcut = The chosen x point for each curve
+        endpoints = The non-pivot x values for each curve
+        middlermse = The average RMSE for each curve
+    '''
 
-    middle_rmse = (ldata[:, 1]+rdata[:, 1])/2  # Mean RMSE
-    mcut = np.argmin(middle_rmse)  # Minimum RMSE index
-    xcut = ldata[mcut, 0]  # x data with minimum RMSE
+    endpoints, middle_rmse = sliding_rmse(x, y)
 
-    endpoints = ldata[:, 0]  # Non-pivot points for fits
+    mcut = np.argmin(middle_rmse, axis=-1)  # Minimum RMSE indexes
+    xcut = np.take_along_axis(endpoints, mcut[..., None], axis=-1)[..., 0]
 
     return xcut, endpoints, middle_rmse
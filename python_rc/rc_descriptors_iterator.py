@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+from job import job
+
+import matplotlib
+import manifest
+import runner
+import sys
+import os
+
+jobs_dir = sys.argv[1]  # The job directories
+job_name = sys.argv[2]  # The generic name for jobs
+export_dir = sys.argv[3]  # The export directory
+datadirname = sys.argv[4]  # Name of data directory
+plotdirname = sys.argv[5]  # Name of plot directory
+
+trajdotlammpstrj = sys.argv[6]  # Trajectories
+testdotout = sys.argv[7]  # LAMMPS print to screen
+depdotin = sys.argv[8]  # Input file
+
+# Comma separated descriptors from: tg, variance, apd, ico_at_tlow
+descriptors = sys.argv[9].split(',')
+
+minimization = sys.argv[10]  # Name of directory containing minimization
+finaltraj = sys.argv[11]  # Trajectories of the minimization
+minimizedotin = sys.argv[12]  # Input file of the minimization
+
+edges = int(sys.argv[13])  # The edges of interest
+faces = int(sys.argv[14])  # The face threshold for the edges of interest
+tol = float(sys.argv[15])  # Largest Tg change in a plateau [K]
+workers = int(sys.argv[16]) if len(sys.argv) > 16 else 1  # Processes
+
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[17] if len(sys.argv) > 17 else 'ovito'
+
+matplotlib.use('Agg')  # No display is needed
+
+known = ['tg', 'variance', 'apd', 'ico_at_tlow']
+unknown = [i for i in descriptors if i not in known]
+if unknown:
+    message = 'Unknown descriptors: '+', '.join(unknown)
+    raise ValueError(message)
+
+# Inputs of each job (variance uses the same files as variance_iterator)
+files = {
+         'tg': [depdotin, testdotout, trajdotlammpstrj],
+         'variance': [depdotin, trajdotlammpstrj],
+         }
+
+# The parameters and data files of each descriptor
+parameters = {
+              'tg': {'mode': 'auto', 'tolerance': tol},
+              'variance': {'stride': 1, 'backend': backend},
+              'apd': {},
+              'ico_at_tlow': {
+                              'edges': edges,
+                              'faces': faces,
+                              'backend': backend
+                              },
+              }
+
+outputs = {
+           'tg': [
+                  'etg.txt',
+                  'etg_temp_cutoff.txt',
+                  'etg_sweep.txt',
+                  'etg_temp_cutoff_auto.txt'
+                  ],
+           'variance': ['variance.txt', 'max_variance.txt'],
+           'apd': ['apd_last.txt'],
+           'ico_at_tlow': ['ico_at_tlow.txt'],
+           }
+
+
+def stale(run, inputs, names):
+    '''
+    Find the requested descriptors that are not up to date.
+
+    inputs:
+        run = The job of the descriptors
+        inputs = The locations of the input files
+        names = The descriptors to check
+
+    outputs:
+        todo = The descriptors to compute
+    '''
+
+    todo = []
+    for descriptor in names:
+        if descriptor not in descriptors:
+            continue
+
+        if manifest.current(
+                            run.datapath,
+                            descriptor,
+                            inputs,
+                            parameters[descriptor]
+                            ):
+            print('Up to date: '+descriptor)
+            continue
+
+        todo.append(descriptor)
+
+    return todo
+
+
+def record(run, inputs, descriptor):
+    '''
+    Save the manifest of a computed descriptor.
+
+    inputs:
+        run = The job of the descriptor
+        inputs = The locations of the input files
+        descriptor = The computed descriptor
+    '''
+
+    names = [os.path.join(run.datapath, i) for i in outputs[descriptor]]
+    manifest.write(
+                   run.datapath,
+                   descriptor,
+                   inputs,
+                   parameters[descriptor],
+                   names
+                   )
+
+
+def analyze(path):
+    '''
+    Calculate every requested descriptor for a job that is not up to date.
+    The input, thermo and trajectory files are parsed once and shared by all
+    descriptors.
+
+    inputs:
+        path = The path of the job
+    '''
+
+    count = 0  # The number of descriptors computed
+
+    if ('tg' in descriptors) or ('variance' in descriptors):
+        run = job(path, export_dir, datadirname, plotdirname)
+
+        inputs = {
+                  i: [os.path.join(path, j) for j in files[i]]
+                  for i in files
+                  }
+
+        todo = stale(run, inputs['tg'], ['tg'])
+        todo += stale(run, inputs['variance'], ['variance'])
+
+        if todo:
+            run.input_file(depdotin)
+            run.box(trajdotlammpstrj)
+
+        if 'tg' in todo:
+            run.sys(testdotout)
+            tcut = run.etg_cutoff('auto', tol)
+            run.etg(max_temp=tcut)
+            record(run, inputs['tg'], 'tg')
+
+        if 'variance' in todo:
+            run.vp_variance(backend=backend)
+            record(run, inputs['variance'], 'variance')
+
+        count += len(todo)
+
+    # The last frame of the minimization is read once for both descriptors
+    if ('apd' in descriptors) or ('ico_at_tlow' in descriptors):
+        for subpath in runner.find(path, minimization):
+            run = job(subpath, export_dir, datadirname)
+
+            traj = os.path.join(subpath, finaltraj)
+            dep = os.path.join(subpath, minimizedotin)
+
+            inputs = [traj, dep]
+            todo = stale(run, inputs, ['apd', 'ico_at_tlow'])
+
+            if 'apd' in todo:
+                run.apd_last(traj, dep)
+                record(run, inputs, 'apd')
+
+            if 'ico_at_tlow' in todo:
+                run.ico(traj, dep, edges=edges, faces=faces, backend=backend)
+                record(run, inputs, 'ico_at_tlow')
+
+            count += len(todo)
+
+    print('-'*79)
+
+    if count == 0:
+        return 'skipped'
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'rc_descriptors'),
+               os.path.join(export_dir, 'logs', 'rc_descriptors_summary.txt')
+               )
@@ -4,55 +4,181 @@ energies.
 '''
 
 import pandas as pd
+import numpy as np
 
+import archive
+import os
 
-def info(filepath):
-    '''
-    Open a file and parse per line.
+
+def blocks(filepath):
     '''
+    Gather the thermo blocks of a file in one pass. A block starts after a
+    line of headers beginning with Step and ends at the Loop time line.
 
-    # Open the file
-    with open(filepath) as file:
-        for line in file:
+    inputs:
+        filepath = The location of the LAMMPS output file
 
-            # Gather the headers for data
-            headers = line.strip().split(' ')
+    outputs:
+        data = The headers and the data lines of each block
+    '''
 
-            # Stop for the first set of headers
-            if 'Step' in headers:
-                break
+    numeric = tuple('-+.0123456789')
 
-    # Open file again
     data = []
-    with open(filepath) as file:
+    headers = None
+    with archive.open(filepath) as file:
         for line in file:
-            values = line.strip().split(' ')
-            values = [i for i in values if '' is not i]
-
-            # Try to gather exported data
-            try:
-                if values:
-                    values = [float(i) for i in values]
-                    values[0] = int(values[0])
-                    data.append(values)
-            except Exception:
-                pass
-
-    # Save the exported data into a pandas dataframe
-    df = pd.DataFrame(data, columns=headers)
-    df = df.drop_duplicates('Step')
+
+            # Look for the headers of the next block
+            if headers is None:
+                values = line.split()
+                if values and (values[0] == 'Step'):
+                    headers = values
+                    lines = []
+
+                continue
+
+            if line.startswith('Loop time'):
+                data.append((headers, lines))
+                headers = None
+                continue
+
+            if line.lstrip().startswith(numeric):
+                lines.append(line)
+
+    # Keep the block of a run that did not finish
+    if headers is not None:
+        data.append((headers, lines))
+
+    return data
+
+
+def convert(headers, lines):
+    '''
+    Convert the data lines of a thermo block to numbers in bulk.
+
+    inputs:
+        headers = The names of the columns
+        lines = The data lines
+
+    outputs:
+        values = The data with one row per line
+    '''
+
+    ncolumns = len(headers)
+
+    values = np.fromstring(''.join(lines), sep=' ')
+
+    # Only keep complete rows if any line was malformed
+    if values.shape[0] != len(lines)*ncolumns:
+        lines = [i for i in lines if len(i.split()) == ncolumns]
+        values = np.fromstring(''.join(lines), sep=' ')
+
+    values = values.reshape(-1, ncolumns)
+
+    return values
+
+
+def info(filepath):
+    '''
+    Parse the thermo data of each run segment. The first row of a segment is
+    dropped when it repeats the last step of the previous segment.
+
+    inputs:
+        filepath = The location of the LAMMPS output file
+
+    outputs:
+        df = The thermo data with the segment number of each row
+    '''
+
+    dfs = []
+    last = None
+    for segment, block in enumerate(blocks(filepath)):
+
+        df = pd.DataFrame(convert(*block), columns=block[0])
+        df['Step'] = df['Step'].astype(np.int64)
+        df['segment'] = segment
+
+        # Remove the step shared by consecutive segments
+        if (last is not None) and (df.shape[0] > 0):
+            if df['Step'].values[0] == last:
+                df = df.iloc[1:]
+
+        if df.shape[0] > 0:
+            last = df['Step'].values[-1]
+
+        dfs.append(df)
+
+    df = pd.concat(dfs, sort=False)
     df = df.reset_index(drop=True)
 
     return df
 
 
+def cached(filepath, cache):
+    '''
+    Load the thermo data from a columnar cache saved by an earlier call. The
+    file is parsed with info and the cache is written again when the size
+    or modification time of the file changes.
+
+    inputs:
+        filepath = The location of the LAMMPS output file
+        cache = The location of the cache file (.npz)
+
+    outputs:
+        df = The thermo data with the segment number of each row
+    '''
+
+    source = np.array(archive.stat(filepath))
+
+    if os.path.isfile(cache):
+        try:
+            with np.load(cache) as saved:
+                if np.array_equal(saved['source'], source):
+                    columns = list(saved['columns'])
+                    data = [
+                            saved['column'+str(i)]
+                            for i in range(len(columns))
+                            ]
+
+                    df = pd.DataFrame(dict(zip(columns, data)))
+
+                    return df[columns]
+
+        except (OSError, ValueError, KeyError):
+            pass
+
+    df = info(filepath)
+
+    # One array per column
+    data = {'column'+str(i): df[j].values for i, j in enumerate(df.columns)}
+
+    # Save for later runs if the directory allows it
+    temporary = cache+'.'+str(os.getpid())
+    try:
+        with open(temporary, 'wb') as outfile:
+            np.savez(
+                     outfile,
+                     source=source,
+                     columns=np.array(df.columns),
+                     **data
+                     )
+
+        os.replace(temporary, cache)
+
+    except OSError:
+        pass
+
+    return df
+
+
 def atoms(name):
     '''
     Open a file and find the number of atoms.
     '''
 
     # Open the file
-    with open(name) as file:
+    with archive.open(name) as file:
         for line in file:
             if 'atoms' in line:
                 atoms = line.strip().split(' ')
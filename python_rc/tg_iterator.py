@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import matplotlib
+import manifest
+import runner
 import sys
 import os
 
@@ -22,71 +20,60 @@ trajdotlammpstrj = sys.argv[6]  # Trajectories
 testdotout = sys.argv[7]  # LAMMPS print to screen
 depdotin = sys.argv[8]  # Input file
 
-# Loop for each path
-for item in os.walk(jobs_dir):
-
-    path = item[0]
+# Select the cutoff by clicking (manual) or from the Tg plateau (auto)
+mode = sys.argv[9] if len(sys.argv) > 9 else 'manual'
+tol = float(sys.argv[10]) if len(sys.argv) > 10 else 5.0  # Plateau [K]
+workers = int(sys.argv[11]) if len(sys.argv) > 11 else 1  # Processes
 
-    split = path.split('/')
+if mode == 'auto':
+    matplotlib.use('Agg')  # No display is needed
 
-    # Filter for paths that contain jobs
-    if jobs_name not in split[-1]:
-        continue
-
-    run = job(path, export_dir, datadirname, plotdirname)
+else:
+    workers = 1  # Clicking needs every job in this process
 
-    run.input_file(depdotin)
-    dfcool = run.sys(testdotout)
-    run.box(trajdotlammpstrj)
+files = [depdotin, testdotout, trajdotlammpstrj]  # Inputs of each job
 
-    temps = dfcool['Temp'].values
-    min_t = temps[-6]  # Minimum number of points for spline to work
-    max_t = max(temps)
 
-    range_t = np.linspace(min_t, max_t, 100)
+def analyze(path):
+    '''
+    Calculate Tg for a job.
 
-    tgs = []
-    for t in range_t:
-        tg = run.etg(max_temp=t, write=False, plot=False, verbose=False)
-        tgs.append(tg)
+    inputs:
+        path = The path of the job
+    '''
 
-    tgs = np.array(tgs)
+    run = job(path, export_dir, datadirname, plotdirname)
 
-    fig, ax = pl.subplots()
+    inputs = [os.path.join(path, i) for i in files]
+    parameters = {'mode': mode, 'tolerance': tol}
+    if manifest.current(run.datapath, 'tg', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
 
-    ax.plot(range_t, tgs, marker='.', linestyle='none', label='Data')
+    run.input_file(depdotin)
+    run.sys(testdotout)
+    run.box(trajdotlammpstrj)
 
-    ax.set_xlabel('Upper Temperature Cutoff [K]')
-    ax.set_ylabel('Tg [K]')
+    tcut = run.etg_cutoff(mode, tol)
 
-    ax.grid()
+    run.etg(max_temp=tcut)
 
-    fig.tight_layout()
+    outputs = ['etg.txt', 'etg_temp_cutoff.txt']
+    if mode == 'auto':
+        outputs += ['etg_sweep.txt', 'etg_temp_cutoff_auto.txt']
 
-    # Go full screen
-    mng = pl.get_current_fig_manager()
-    mng.full_screen_toggle()
+    outputs = [os.path.join(run.datapath, i) for i in outputs]
+    manifest.write(run.datapath, 'tg', inputs, parameters, outputs)
 
-    plot_path = os.path.join(*[export_dir, path.strip('../'), plotdirname])
+    print('-'*79)
 
-    click = fig.ginput(n=-1, mouse_add=1, mouse_pop=3)
-    tcut = click[-1][0]
 
-    ax.axvline(
-               tcut,
-               linestyle=':',
-               color='k',
-               label='Upper Temperature Cutoff: '+str(tcut)+' [K]'
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, jobs_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'tg'),
+               os.path.join(export_dir, 'logs', 'tg_summary.txt')
                )
-
-    ax.legend(loc='upper center')
-
-    fig.savefig(os.path.join(plot_path, 'etg_temp_cutoff.png'))
-
-    pl.close('all')
-
-    print('Upper cutoff temperature set to '+str(tcut)+' [K]')
-
-    run.etg(max_temp=tcut)
-
-    print('-'*79)
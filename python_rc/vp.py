@@ -0,0 +1,199 @@
+'''
+Accumulate and analyze Voronoi polyhedra (VP) indexes.
+'''
+
+import numpy as np
+import itertools
+
+
+class histogram:
+    '''
+    Count the distinct VP indexes one frame at a time. Each index row is
+    packed into a bytes key with its trailing zeros removed, so memory grows
+    with the number of distinct VP instead of atoms times frames.
+    '''
+
+    def __init__(self):
+        '''
+        Start with no counts.
+
+        inputs:
+            self = The object reference
+        '''
+
+        self.counts = {}  # The number of atoms for each key
+        self.width = 0  # The widest index row seen
+
+    def add(self, indexes):
+        '''
+        Count the VP indexes of one frame.
+
+        inputs:
+            self = The object reference
+            indexes = The VP index of each atom
+        '''
+
+        indexes = np.asarray(indexes)
+
+        if indexes.size and ((indexes.min() < 0) or (indexes.max() > 255)):
+            message = 'VP index counts need to be between 0 and 255.'
+            raise ValueError(message)
+
+        rows = np.ascontiguousarray(indexes, dtype=np.uint8)
+        keys = rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+
+        # Count the distinct rows of the frame before updating the totals
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys, counts):
+            key = key.tobytes().rstrip(b'\x00')
+            self.counts[key] = self.counts.get(key, 0)+int(count)
+
+        self.width = max(self.width, rows.shape[1])
+
+    def unique(self):
+        '''
+        Give the counted VP like np.unique(indexes, axis=0) would.
+
+        inputs:
+            self = The object reference
+
+        outputs:
+            coords = The distinct VP indexes in lexicographic order
+            counts = The number of atoms for each VP index
+        '''
+
+        # Sorting bytes keys matches sorting the zero padded rows
+        keys = sorted(self.counts)
+
+        coords = np.zeros((len(keys), self.width), dtype=np.int64)
+        for i, key in enumerate(keys):
+            coords[i, :len(key)] = np.frombuffer(key, dtype=np.uint8)
+
+        counts = np.array([self.counts[i] for i in keys], dtype=np.int64)
+
+        return coords, counts
+
+
+def cumulative_variance(fractions):
+    '''
+    Calculate the variance of the first i ordered VP fractions for i from 1
+    to n-1 from cumulative sums of the fractions and their squares.
+
+    inputs:
+        fractions = The VP fractions in descending order
+
+    outputs:
+        variance = The variance for each number of VP types included
+        max_index = The index of the maximum variance
+    '''
+
+    fractions = np.asarray(fractions, dtype=np.float64)
+
+    n = fractions.shape[0]
+    included = np.arange(1, n)  # The number of VP types included
+
+    # The variance does not change with a shift, which limits rounding errors
+    shifted = fractions[:n-1]-fractions[0]
+
+    mean = np.cumsum(shifted)/included
+    variance = np.cumsum(shifted**2)/included-mean**2
+    variance = np.clip(variance, 0.0, None)  # Remove negative rounding errors
+
+    max_index = np.argmax(variance) if variance.shape[0] else None
+
+    return variance, max_index
+
+
+def indexes(positions, bounds, threshold=0.1, margin=None):
+    '''
+    Compute the VP indexes of atoms in a periodic orthogonal box with SciPy.
+    Periodic images within a margin around the box are added before the
+    tessellation. Column j counts the faces with j+1 edges longer than the
+    threshold, like the Voronoi Index of OVITO.
+
+    inputs:
+        positions = The positions of the atoms with shape (atoms, 3)
+        bounds = The box boundaries (xlo, xhi, ylo, yhi, zlo, zhi)
+        threshold = The maximum length for a VP edge
+        margin = The thickness of periodic images (three times the mean
+                 spacing between atoms if None)
+
+    outputs:
+        indexes = The VP index of each atom
+    '''
+
+    from scipy.spatial import Voronoi  # Only needed by the native backend
+
+    positions = np.asarray(positions, dtype=np.float64)
+    bounds = np.reshape(bounds, (3, 2))
+
+    natoms = positions.shape[0]
+    lo = bounds[:, 0]
+    length = bounds[:, 1]-bounds[:, 0]
+
+    if margin is None:
+        margin = 3.0*(np.prod(length)/natoms)**(1.0/3.0)
+
+    # Wrap atoms into the box and add the periodic images near its faces
+    x = lo+np.mod(positions-lo, length)
+
+    points = [x]
+    for shift in itertools.product([-1, 0, 1], repeat=3):
+        if shift == (0, 0, 0):
+            continue
+
+        image = x+np.array(shift)*length
+        keep = (image >= lo-margin) & (image <= lo+length+margin)
+        points.append(image[np.all(keep, axis=1)])
+
+    points = np.concatenate(points)
+    vor = Voronoi(points)
+
+    # Faces of at least one atom inside the box
+    pairs = vor.ridge_points
+    faces = np.flatnonzero(np.any(pairs < natoms, axis=1))
+    pairs = pairs[faces]
+
+    vertices = [vor.ridge_vertices[i] for i in faces]
+    sizes = np.array([len(i) for i in vertices])
+    vertices = np.concatenate(vertices)
+
+    if np.any(vertices == -1):
+        message = 'Open Voronoi cells in the box. Increase the margin.'
+        raise ValueError(message)
+
+    face = np.repeat(np.arange(faces.shape[0]), sizes)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    ends = starts+sizes
+
+    # Order the vertices of each face by angle around its center
+    v = vor.vertices[vertices]
+    center = np.add.reduceat(v, starts, axis=0)/sizes[:, None]
+    d = v-center[face]
+
+    normal = points[pairs[:, 1]]-points[pairs[:, 0]]
+    normal /= np.linalg.norm(normal, axis=1)[:, None]
+
+    u = d[starts]
+    u -= np.sum(u*normal, axis=1)[:, None]*normal
+    u /= np.linalg.norm(u, axis=1)[:, None]
+    w = np.cross(normal, u)
+
+    angle = np.arctan2(np.sum(d*w[face], axis=1), np.sum(d*u[face], axis=1))
+    v = v[np.lexsort((angle, face))]
+
+    # Count the edges of each face longer than the threshold
+    following = np.arange(v.shape[0])+1
+    following[ends-1] = starts
+
+    edges = np.linalg.norm(v[following]-v, axis=1)
+    orders = np.add.reduceat((edges > threshold).astype(np.int64), starts)
+
+    width = max(orders.max(), 1) if orders.shape[0] else 1
+    indexes = np.zeros((natoms, width), dtype=np.int64)
+    for side in range(2):
+        atoms = pairs[:, side]
+        condition = (atoms < natoms) & (orders > 0)
+        np.add.at(indexes, (atoms[condition], orders[condition]-1), 1)
+
+    return indexes
@@ -1,20 +1,11 @@
-from PyQt5 import QtGui  # Added to be able to import ovito
-
-from matplotlib import pyplot as pl
-
-from scipy.signal import argrelextrema
-import scipy as sc
-
-import pymatgen as mg
 import pandas as pd
 import numpy as np
 
 import os
 
-from ovito.modifiers import VoronoiAnalysisModifier
-from ovito.io import import_file
-
+import pipeline
 import traj
+import vp
 import dep
 
 
@@ -110,6 +101,9 @@ class job:
                 write=True,
                 plot=True,
                 first=10,
+                stride=1,
+                workers=1,
+                backend='ovito',
                 verbose=True
                 ):
         '''
@@ -120,6 +114,10 @@ class job:
             threshold = The maximum length for a VP edge
             write = Whether or not to save the fractions and temperatures
             plot = Whether or not to plot the fractions and temperatures
+            first = The number of most frequent VP to plot
+            stride = Use every stride frame of the hold
+            workers = The number of processes computing frames
+            backend = Compute with OVITO (ovito) or SciPy (native)
             verbose = Wheter or not to print calculation status
 
         outputs:
@@ -162,33 +160,23 @@ class job:
         df['time'] = df['time']-df['time'][0]
         df['frame'] = df['frame']-df['frame'][0]
 
-        # Load input data and create an ObjectNode with a data pipeline.
-        node = import_file(self.file_trajs, multiple_frames=True)
-
-        voro = VoronoiAnalysisModifier(
-                                       compute_indices=True,
-                                       use_radii=False,
-                                       edge_threshold=threshold
-                                       )
-
-        node.modifiers.append(voro)
-
-        all_indexes = []
+        # Compute the Voronoi indexes of frames over a pool of processes
+        all_indexes = pipeline.voronoi_frames(
+                                              self.file_trajs,
+                                              df['frame'].values[::stride],
+                                              threshold,
+                                              workers,
+                                              backend=backend
+                                              )
+
+        # Count the number of unique VP one frame at a time
+        vps = vp.histogram()
         frames = 0
-        for frame in df['frame']:
-            out = node.compute(frame)
-            indexes = out.particle_properties['Voronoi Index'].array
-            all_indexes.append(indexes)
+        for indexes in all_indexes:
+            vps.add(indexes)
             frames += 1
 
-        # Combine all the frames
-        all_indexes = [pd.DataFrame(i) for i in all_indexes]
-        df = pd.concat(all_indexes)
-        df = df.fillna(0)  # Make cure indexes are zero if not included
-        df = df.astype(int)  # Make sure all counts are integers
-
-        # Count the number of unique VP
-        coords, counts = np.unique(df.values, axis=0, return_counts=True)
+        coords, counts = vps.unique()
 
         # Standard notation
         coords = coords[:, 2:]
@@ -205,18 +193,13 @@ class job:
         fractions = counts/total
 
         # Calculate variance from list including ordered fractions of VP
-        variance = []
-        for i in range(1, counts.shape[0]):
-            variance.append(np.var(fractions[:i]))
-
-        variance = np.array(variance)  # Numpy array
+        variance, max_index = vp.cumulative_variance(fractions)
         vptypes = np.arange(1, len(variance)+1)  # Types of vp
 
         df_variance = {'number_of_vp': vptypes, 'variance': variance}
         df_variance = pd.DataFrame(df_variance)
         df_variance['number_of_vp'] = df_variance['number_of_vp'].astype(int)
 
-        max_index = np.argmax(variance)
         max_variance = pd.DataFrame(df_variance.loc[max_index, :]).T
         max_variance['number_of_vp'] = max_variance['number_of_vp'].astype(int)
 
@@ -236,6 +219,7 @@ class job:
 
 
         if plot:
+            from matplotlib import pyplot as pl
 
             # Plot variance
             for i in [counts.shape[0], first]:
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 
-from scipy.signal import argrelextrema
-from matplotlib import pyplot as pl
-
 from job import job
 
-import numpy as np
-
+import manifest
+import runner
 import sys
 import os
 
@@ -18,23 +15,54 @@ plotdirname = sys.argv[5]  # Name of plot directory
 
 trajdotlammpstrj = sys.argv[6]  # Trajectories
 depdotin = sys.argv[7]  # Input file
+workers = int(sys.argv[8]) if len(sys.argv) > 8 else 1  # Processes
+stride = int(sys.argv[9]) if len(sys.argv) > 9 else 1  # Frame stride
 
-# Loop for each path
-for item in os.walk(jobs_dir):
+# Processes for the frames of each job
+frame_workers = int(sys.argv[10]) if len(sys.argv) > 10 else 1
 
-    path = item[0]
+# Compute Voronoi indexes with OVITO (ovito) or SciPy (native)
+backend = sys.argv[11] if len(sys.argv) > 11 else 'ovito'
 
-    split = path.split('/')
 
-    # Filter for paths that contain jobs
-    if job_name not in split[-1]:
-        continue
+def analyze(path):
+    '''
+    Calculate the VP variance for a job.
+
+    inputs:
+        path = The path of the job
+    '''
 
     run = job(path, export_dir, datadirname, plotdirname)
 
+    inputs = [os.path.join(path, i) for i in [depdotin, trajdotlammpstrj]]
+    parameters = {'stride': stride, 'backend': backend}
+    if manifest.current(run.datapath, 'variance', inputs, parameters):
+        print('Up to date: '+path)
+        return 'skipped'
+
     run.input_file(depdotin)
     run.box(trajdotlammpstrj)
 
-    run.vp_variance()
+    run.vp_variance(
+                    stride=stride,
+                    workers=frame_workers,
+                    backend=backend
+                    )
+
+    outputs = ['variance.txt', 'max_variance.txt']
+    outputs = [os.path.join(run.datapath, i) for i in outputs]
+    manifest.write(run.datapath, 'variance', inputs, parameters, outputs)
 
     print('-'*79)
+
+
+if __name__ == '__main__':
+    paths = runner.find(jobs_dir, job_name)
+    runner.run(
+               paths,
+               analyze,
+               workers,
+               os.path.join(export_dir, 'logs', 'variance'),
+               os.path.join(export_dir, 'logs', 'variance_summary.txt')
+               )